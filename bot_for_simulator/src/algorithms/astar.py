@@ -1,11 +1,27 @@
-import heapq
+from algorithms.dstar_lite import DStarLite
+from algorithms.belief_map import BeliefMap, OBSTACLE
+from algorithms.landmarks import LandmarkTable
+from algorithms.sparse import DENSE_CELLS_LIMIT
 
 
 class AStarBot:
+    EXPLORE_RETRY = 10
+
     def __init__(self, config: dict = None):
         self.config = config or {}
         self.internal_state = {}
         self.vision_radius = self.config.get("vision_radius", 5)
+        # Карта препятствий из /static-map (parse_static_map): {"width", "height", "seed", "obstacles"}
+        self.static_map = self.config.get("static_map")
+        self.landmarks = None
+        self.planner = None
+        self.belief = None
+        # Текущий маршрут: от позиции агента до целевого ресурса или неизученной клетки
+        self.route = []
+        self.exploring = False
+        # Когда исследование не нашло пути: (такт, число известных клеток)
+        self.explore_failed = None
+        self.stats = {"plans": 0, "reused": 0}
 
     def step(self, state: dict) -> tuple:
         try:
@@ -14,7 +30,13 @@ class AStarBot:
             
             self._update_internal_state(state)
 
-            route = self._make_decision()
+            route = self._follow_route()
+            if route is None:
+                route = self._make_decision()
+                self.stats["plans"] += 1
+            else:
+                self.stats["reused"] += 1
+            self.route = route
 
             decision = self._get_first_direction(route)
 
@@ -26,92 +48,144 @@ class AStarBot:
             
         except Exception as e:
             print(f"Algorithm error: {str(e)}")
+            self.route = []
             return {"command": "attack"}, None
 
 
     def _update_internal_state(self, state: dict):
+        belief = self.belief
+        if belief is None or (belief.width, belief.height) != (self.world_width, self.world_height):
+            belief = self.belief = BeliefMap(self.world_width, self.world_height, self.vision_radius)
+            self.planner = None
+            self._load_static_map()
+        
         self.internal_state["agent_pos"] = (state["agent"]["x"], state["agent"]["y"])
-        self.internal_state["resources"] = state.get("resources", [])
-        self.internal_state["obstacles"] = state.get("obstacles", []) + state.get("npcs", [])
+        changes = belief.observe(
+            self.internal_state["agent_pos"],
+            state.get("resources", []),
+            state.get("obstacles", []),
+            state.get("npcs", [])
+        )
+        # Ресурсы и препятствия - из памяти, а не только из текущего обзора
+        self.internal_state["resources"] = belief.resources
+        self.internal_state["new_resources"] = changes["new_resources"]
+        
+        # Изменения, еще не переданные планировщику
+        pending = self.internal_state.setdefault("pending", {"blocked": set(), "unblocked": set()})
+        for cell in changes["new_obstacles"] + changes["npcs_added"]:
+            pending["blocked"].add(cell)
+            pending["unblocked"].discard(cell)
+        for cell in changes["npcs_removed"]:
+            if not belief.is_blocked(cell):
+                pending["unblocked"].add(cell)
+                pending["blocked"].discard(cell)
 
 
-    def _make_decision(self) -> list:
-        # Шаг 1: Подготовка данных
+    def _load_static_map(self):
+        """
+        Известные заранее препятствия. С config["landmarks"] > 0 (по умолчанию выключено)
+        по ним строится таблица ALT для планировщика, кэшируемая на диске по seed мира.
+        """
+        static_map = self.static_map
+        self.landmarks = None
+        if not static_map or (static_map["width"], static_map["height"]) != (self.world_width, self.world_height):
+            return
+        
+        self.belief.add_obstacles(static_map["obstacles"])
+        # Таблицы ALT плотные - на больших полях не строятся
+        if not self.config.get("landmarks") or self.world_width * self.world_height > DENSE_CELLS_LIMIT:
+            return
+        blocked = bytearray(cell == OBSTACLE for cell in self.belief.cells)
+        self.landmarks = LandmarkTable.load_or_build(
+            self.world_width, self.world_height, blocked, static_map.get("seed"),
+            self.config["landmarks"]
+        )
+
+
+    def _follow_route(self):
+        """
+        Продолжение текущего маршрута, если он еще годится, иначе None.
+        Проверка дешевая: клетки маршрута и новые ресурсы, без поиска.
+        """
+        route = self.route
         agent_pos = self.internal_state["agent_pos"]
-        resources = self.internal_state.get("resources", [])
-        obstacles = self.internal_state.get("obstacles", set())
         
-        # Шаг 2: Проверка наличия ресурсов
-        if not resources:
-            return []  # Если ресурсов нет - возвращаем пустой путь
-
-        # Шаг 3: Определение эвристической функции (манхэттенское расстояние)
-        def heuristic(pos):
-            min_distance = float('inf')
-            for res in resources:
-                # Вычисляем расстояние до каждого ресурса
-                distance = abs(pos[0] - res[0]) + abs(pos[1] - res[1])
-                if distance < min_distance:
-                    min_distance = distance
-            return min_distance
-
-        # Шаг 4: Инициализация структур данных для A*
-        open_set = []  # Приоритетная очередь (min-heap)
-        heapq.heappush(open_set, (0 + heuristic(agent_pos), agent_pos))
+        # Агент сделал запланированный шаг или остался на месте (атака)
+        if len(route) >= 2 and route[1] == agent_pos:
+            route = route[1:]
+        elif not route or route[0] != agent_pos:
+            return None  # респавн или неожиданная позиция
+        if len(route) < 2:
+            return None
+        
+        # Маршрут перекрыт препятствием или NPC
+        belief = self.belief
+        if any(belief.is_blocked(cell) for cell in route[1:]):
+            return None
+        
+        resources = self.internal_state["resources"]
+        if self.exploring:
+            # Исследование прерывается, как только известен хотя бы один ресурс
+            return None if resources else route
         
-        g_score = {agent_pos: 0}  # Стоимость пути от старта
-        came_from = {}  # Для восстановления пути
-        came_from[agent_pos] = None
+        # Целевой ресурс собран
+        if route[-1] not in resources:
+            return None
+        
+        # Появился ресурс, который может оказаться ближе цели
+        remaining = len(route) - 1
+        for res in self.internal_state["new_resources"]:
+            if abs(res[0] - agent_pos[0]) + abs(res[1] - agent_pos[1]) < remaining:
+                return None
+        return route
 
-        # Возможные направления движения
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
 
-        # Шаг 5: Основной цикл A*
-        while open_set:
-            # Извлекаем узел с наименьшей общей стоимостью (f = g + h)
-            current_f, current = heapq.heappop(open_set)
-            
-            # Проверка на актуальность узла
-            if current != agent_pos:  # Пропускаем проверку для стартовой точки
-                # Если текущая стоимость g выше сохраненной - узел устарел
-                if current_f - heuristic(current) > g_score[current]:
-                    continue
-            
-            # Шаг 6: Проверка достижения цели
-            if current in resources:
-                # Восстановление пути
-                path = []
-                while current:
-                    path.append(current)
-                    current = came_from[current]
-                return path[::-1]  # Разворачиваем путь от цели к агенту
-            
-            # Шаг 7: Обработка соседей
-            for dx, dy in directions:
-                neighbor = (current[0] + dx, current[1] + dy)
-                
-                # Проверка границ мира
-                if (neighbor[0] < 0 or neighbor[0] >= self.world_width or
-                    neighbor[1] < 0 or neighbor[1] >= self.world_height):
-                    continue
-                
-                # Проверка на препятствия
-                if neighbor in obstacles:
-                    continue
-                
-                # Вычисление новой стоимости пути
-                tentative_g = g_score[current] + 1
-                
-                # Если новый путь лучше существующего
-                if neighbor not in g_score or tentative_g < g_score[neighbor]:
-                    g_score[neighbor] = tentative_g
-                    f_score = tentative_g + heuristic(neighbor)
-                    heapq.heappush(open_set, (f_score, neighbor))
-                    came_from[neighbor] = current
+    def _make_decision(self) -> list:
+        """
+        Маршрут до ближайшего известного ресурса (D* Lite пересчитывает только изменения),
+        а если ресурсы недостижимы - до ближайшей неизученной клетки.
+        """
+        route = self._plan_to_resources() if self.internal_state["resources"] else []
+        self.exploring = not route
+        if self.exploring and self._should_explore():
+            route = self.belief.path_to_unknown(self.internal_state["agent_pos"])
+            self.explore_failed = None if route else (self.belief.tick, self.belief.known)
+        return route
+
+    def _should_explore(self) -> bool:
+        """
+        После неудачного поиска неизученных клеток повторяем его, только когда карта
+        пополнилась или прошло EXPLORE_RETRY тактов (NPC могли освободить проход).
+        """
+        if self.explore_failed is None:
+            return True
+        tick, known = self.explore_failed
+        return self.belief.known != known or self.belief.tick - tick >= self.EXPLORE_RETRY
+
+    def _plan_to_resources(self) -> list:
+        belief = self.belief
+        planner = self.planner
+        pending = self.internal_state["pending"]
+        if planner is None:
+            planner = self.planner = DStarLite(self.world_width, self.world_height, self.landmarks)
+            # Новому планировщику нужна вся память, а не только изменения
+            pending["blocked"] = belief.blocked_cells()
+            pending["unblocked"] = set()
         
-        # Шаг 8: Если путь не найден
-        return []
-    
+        # Передаем планировщику только изменения с прошлого планирования
+        resources = self.internal_state["resources"]
+        planner.update(
+            self.internal_state["agent_pos"],
+            blocked=pending["blocked"],
+            unblocked=pending["unblocked"],
+            goals=resources - planner.goals,
+            removed_goals=planner.goals - resources
+        )
+        pending["blocked"], pending["unblocked"] = set(), set()
+        
+        planner.compute()
+        return planner.path()
+
     def _get_first_direction(self, path):
         """
         Определяет первое направление движения из маршрута
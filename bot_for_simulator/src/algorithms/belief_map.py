@@ -0,0 +1,156 @@
+from collections import deque
+from algorithms.sparse import cell_array, is_sparse
+
+UNKNOWN = 0
+FREE = 1
+OBSTACLE = 2
+
+
+class BeliefMap:
+    """
+    Память бота о мире за пределами текущего обзора.
+    Плоские массивы по номеру клетки x * height + y:
+        cells         - UNKNOWN / FREE / OBSTACLE (препятствия неподвижны и не забываются)
+        resource_seen - такт, когда в клетке последний раз видели ресурс (-1 - нет ресурса)
+        npc_seen      - такт, когда в клетке последний раз видели NPC (-1 - никогда)
+    Занятость клетки NPC затухает как npc_decay ** (возраст наблюдения); клетка
+    считается занятой, пока занятость не меньше npc_threshold.
+    observe() возвращает изменения для планировщика.
+    На полях больше sparse.DENSE_CELLS_LIMIT клеток массивы разреженные (SparseArray).
+    """
+    def __init__(self, width: int, height: int, vision_radius: int,
+                 npc_decay: float = 0.5, npc_threshold: float = 0.25):
+        self.width = width
+        self.height = height
+        self.tick = 0
+        self.cells = cell_array(width * height, UNKNOWN)
+        self.resource_seen = cell_array(width * height, -1, 'i')
+        self.npc_seen = cell_array(width * height, -1, 'i')
+        self.resources = set()
+        # Сколько клеток уже известно - меняется, только когда обзор открывает новое
+        self.known = 0
+        # NPC, которые еще считаются занимающими клетку: клетка -> такт наблюдения
+        self.npcs = {}
+        self.npc_decay = npc_decay
+        self.npc_threshold = npc_threshold
+        self.npc_memory = 0
+        while npc_decay ** (self.npc_memory + 1) >= npc_threshold:
+            self.npc_memory += 1
+        # Смещения клеток круга обзора
+        self.view = [(dx, dy) for dx in range(-vision_radius, vision_radius + 1)
+                     for dy in range(-vision_radius, vision_radius + 1)
+                     if dx * dx + dy * dy <= vision_radius * vision_radius]
+
+    def _index(self, cell: tuple) -> int:
+        return cell[0] * self.height + cell[1]
+
+    def add_obstacles(self, obstacles):
+        """Препятствия, известные заранее (например, из /static-map)"""
+        for cell in obstacles:
+            i = self._index(cell)
+            self.known += self.cells[i] == UNKNOWN
+            self.cells[i] = OBSTACLE
+
+    def npc_occupancy(self, cell: tuple) -> float:
+        seen = self.npc_seen[self._index(cell)]
+        return 0.0 if seen < 0 else self.npc_decay ** (self.tick - seen)
+
+    def observe(self, agent_pos: tuple, resources, obstacles, npcs) -> dict:
+        """
+        Учитывает наблюдение такта. Возвращает изменения:
+        new_obstacles, new_resources, removed_resources, npcs_added, npcs_removed.
+        """
+        self.tick += 1
+        tick, height = self.tick, self.height
+        cells, resource_seen = self.cells, self.resource_seen
+
+        new_obstacles = []
+        for cell in obstacles:
+            i = self._index(cell)
+            if cells[i] != OBSTACLE:
+                self.known += cells[i] == UNKNOWN
+                cells[i] = OBSTACLE
+                new_obstacles.append(cell)
+
+        visible_resources = set(resources)
+        new_resources = []
+        for cell in visible_resources:
+            resource_seen[self._index(cell)] = tick
+            if cell not in self.resources:
+                self.resources.add(cell)
+                new_resources.append(cell)
+
+        # Все видимые клетки без препятствий становятся известными; ресурсы, которых
+        # больше не видно в зоне обзора, собраны
+        removed_resources = []
+        ax, ay = agent_pos
+        for dx, dy in self.view:
+            x, y = ax + dx, ay + dy
+            if 0 <= x < self.width and 0 <= y < height:
+                i = x * height + y
+                if cells[i] == UNKNOWN:
+                    cells[i] = FREE
+                    self.known += 1
+                if resource_seen[i] >= 0 and resource_seen[i] != tick:
+                    resource_seen[i] = -1
+                    self.resources.discard((x, y))
+                    removed_resources.append((x, y))
+
+        npcs_before = set(self.npcs)
+        for cell in npcs:
+            self.npc_seen[self._index(cell)] = tick
+            self.npcs[cell] = tick
+        # Затухание: старые наблюдения NPC перестают занимать клетку
+        for cell, seen in list(self.npcs.items()):
+            if tick - seen > self.npc_memory:
+                del self.npcs[cell]
+
+        return {
+            "new_obstacles": new_obstacles,
+            "new_resources": new_resources,
+            "removed_resources": removed_resources,
+            "npcs_added": [cell for cell in self.npcs if cell not in npcs_before],
+            "npcs_removed": [cell for cell in npcs_before if cell not in self.npcs],
+        }
+
+    def is_blocked(self, cell: tuple) -> bool:
+        return self.cells[self._index(cell)] == OBSTACLE or cell in self.npcs
+
+    def blocked_cells(self) -> set:
+        """Все клетки, для которых is_blocked истинно (поиск препятствий - bytearray.find)"""
+        cells, height = self.cells, self.height
+        blocked = set(self.npcs)
+        if is_sparse(cells):
+            blocked.update(divmod(i, height) for i, value in cells.items() if value == OBSTACLE)
+            return blocked
+        i = cells.find(OBSTACLE)
+        while i >= 0:
+            blocked.add(divmod(i, height))
+            i = cells.find(OBSTACLE, i + 1)
+        return blocked
+
+    def path_to_unknown(self, start: tuple) -> list:
+        """
+        Исследование: кратчайший путь по известным клеткам до ближайшей
+        неизвестной (граница изученной области) или [], если неизвестных не осталось.
+        """
+        height, cells, npcs = self.height, self.cells, self.npcs
+        start_index = self._index(start)
+        came_from = {start_index: None}
+        frontier = deque([start_index])
+        while frontier:
+            i = frontier.popleft()
+            if cells[i] == UNKNOWN:
+                path = []
+                while i is not None:
+                    path.append(divmod(i, height))
+                    i = came_from[i]
+                return path[::-1]
+            x, y = divmod(i, height)
+            for nx, ny in ((x, y + 1), (x + 1, y), (x, y - 1), (x - 1, y)):
+                if 0 <= nx < self.width and 0 <= ny < height:
+                    j = nx * height + ny
+                    if j not in came_from and cells[j] != OBSTACLE and (nx, ny) not in npcs:
+                        came_from[j] = i
+                        frontier.append(j)
+        return []
@@ -0,0 +1,263 @@
+import heapq
+from algorithms.sparse import cell_array, is_sparse
+
+INF = float('inf')
+
+
+class DStarLite:
+    """
+    Инкрементальный планировщик D* Lite на сетке с несколькими целями.
+
+    Поиск идет от целей (ресурсов) к агенту: g(s) - длина кратчайшего пути
+    из клетки s до ближайшей цели. Между вызовами значения g/rhs сохраняются,
+    поэтому после изменения препятствий, целей или позиции агента пересчитываются
+    только затронутые изменением клетки, а не вся карта.
+    Эвристика - манхэттенское расстояние до агента (одна точка, O(1)).
+
+    Состояние хранится в плоских массивах по номеру клетки x * height + y:
+    g, rhs - списки, blocked и goal - bytearray, поэтому проверки клеток
+    не зависят от числа препятствий и ресурсов (на полях больше
+    sparse.DENSE_CELLS_LIMIT клеток - разреженные SparseArray). touched - клетки,
+    которым назначался rhs: при построении плана заново сбрасываются только они,
+    а не вся карта (на больших полях план касается малой ее части).
+    Если целей еще нет в плане (первый план, все прежние цели пропали),
+    план строится заново поиском в ширину сразу от всех целей.
+    С таблицей опорных клеток (landmarks.LandmarkTable) вместо манхэттенского
+    расстояния используется оценка ALT, а план с нуля строится тем же
+    направленным поиском D* Lite: клеток раскрывается примерно вдвое меньше, но каждый
+    ключ дороже, поэтому по времени это выгодно только на картах, где много раз
+    строятся планы с нуля (см. AStarBot, параметр landmarks).
+
+        planner = DStarLite(width, height)
+        planner.update(agent_pos, blocked=new_obstacles, goals=resources)
+        planner.compute()
+        path = planner.path()
+    """
+    def __init__(self, width: int, height: int, landmarks=None):
+        self.width = width
+        self.height = height
+        self.landmarks = landmarks
+        self.blocked = cell_array(width * height)
+        self.goal = cell_array(width * height)
+        # Те же цели в виде координат
+        self.goals = set()
+        self.start = None
+        self.expanded = 0
+        self.g = cell_array(width * height, INF)
+        self.rhs = cell_array(width * height, INF)
+        self.touched = set()
+        self._clear()
+
+    def _clear(self):
+        g, rhs = self.g, self.rhs
+        if is_sparse(g) or len(self.touched) * 8 > len(g):
+            self.g = cell_array(self.width * self.height, INF)
+            self.rhs = cell_array(self.width * self.height, INF)
+        else:
+            for i in self.touched:
+                g[i] = rhs[i] = INF
+        self.touched = set()
+        self.queue = []
+        # Клетка -> актуальный ключ; записи кучи с другим ключом устарели
+        self.queued = {}
+        self.km = 0
+        self.planned = False
+
+    def _index(self, cell: tuple) -> int:
+        return cell[0] * self.height + cell[1]
+
+    def _cell(self, index: int) -> tuple:
+        return divmod(index, self.height)
+
+    def _heuristic(self, i: int) -> int:
+        """Нижняя оценка расстояния от клетки i до агента"""
+        if self.landmarks is not None:
+            return self.landmarks.estimate(i)
+        x, y = divmod(i, self.height)
+        sx, sy = divmod(self.start, self.height)
+        return abs(x - sx) + abs(y - sy)
+
+    def _key(self, i: int) -> tuple:
+        m = min(self.g[i], self.rhs[i])
+        return (m + self._heuristic(i) + self.km, m)
+
+    def _neighbors(self, i: int) -> list:
+        height = self.height
+        x, y = divmod(i, height)
+        result = []
+        if y < height - 1:
+            result.append(i + 1)
+        if x < self.width - 1:
+            result.append(i + height)
+        if y > 0:
+            result.append(i - 1)
+        if x > 0:
+            result.append(i - height)
+        return result
+
+    def _update_vertex(self, u: int):
+        self.touched.add(u)
+        if not self.goal[u]:
+            best = INF
+            blocked, g = self.blocked, self.g
+            for v in self._neighbors(u):
+                if not blocked[v] and g[v] + 1 < best:
+                    best = g[v] + 1
+            self.rhs[u] = best
+
+        if self.g[u] != self.rhs[u]:
+            key = self._key(u)
+            self.queued[u] = key
+            heapq.heappush(self.queue, (key, u))
+        else:
+            self.queued.pop(u, None)
+
+    def update(self, start: tuple, blocked=(), unblocked=(), goals=(), removed_goals=()):
+        """
+        Сообщает планировщику новую позицию агента и изменения с прошлого вызова:
+        клетки, ставшие непроходимыми/проходимыми, новые и исчезнувшие цели.
+        """
+        previous, self.start = self.start, self._index(start)
+        if self.landmarks is not None:
+            self.landmarks.set_target(self.start)
+        if previous is not None:
+            self.km += self._heuristic(previous)
+
+        changed_goals = []
+        for cell in removed_goals:
+            if cell in self.goals:
+                self.goals.discard(cell)
+                self.goal[self._index(cell)] = 0
+                changed_goals.append(self._index(cell))
+        kept_goals = bool(self.goals)
+        for cell in goals:
+            if cell not in self.goals:
+                self.goals.add(cell)
+                self.goal[self._index(cell)] = 1
+                changed_goals.append(self._index(cell))
+
+        changed_cells = []
+        for cell in blocked:
+            i = self._index(cell)
+            if not self.blocked[i]:
+                self.blocked[i] = 1
+                changed_cells.append(i)
+        for cell in unblocked:
+            i = self._index(cell)
+            if self.blocked[i]:
+                self.blocked[i] = 0
+                changed_cells.append(i)
+
+        # Ни одной прежней цели: старые значения g бесполезны, дешевле построить план заново
+        if not self.planned or not kept_goals:
+            self._rebuild()
+            return
+
+        for u in changed_goals:
+            if self.goal[u]:
+                self.rhs[u] = 0
+            self._update_vertex(u)
+        # Проходимость клетки v меняет стоимость переходов в нее из соседних клеток
+        for v in changed_cells:
+            for u in self._neighbors(v):
+                self._update_vertex(u)
+
+    def _rebuild(self):
+        """
+        Без таблицы опорных клеток - поиск в ширину от всех целей сразу
+        (веса ребер одинаковые) до слоя с агентом. Клетки пройденных слоев согласованы, следующий слой попадает в очередь D* Lite,
+        так что дальше план обновляется инкрементально.
+        """
+        self._clear()
+        self.planned = True
+        g, rhs, blocked = self.g, self.rhs, self.blocked
+
+        if self.landmarks is not None:
+            # Цели - в очередь, дальше обычный поиск compute() с оценкой ALT
+            for cell in self.goals:
+                i = self._index(cell)
+                rhs[i] = 0
+                self.touched.add(i)
+                self.queued[i] = self._key(i)
+                self.queue.append((self.queued[i], i))
+            heapq.heapify(self.queue)
+            return
+
+        layer = [self._index(cell) for cell in self.goals]
+        for i in layer:
+            rhs[i] = 0
+        self.touched.update(layer)
+        while layer:
+            reached = False
+            following = []
+            for i in layer:
+                g[i] = rhs[i]
+                self.expanded += 1
+                reached = reached or i == self.start
+                # В непроходимую клетку войти нельзя - от нее волна не распространяется
+                if blocked[i]:
+                    continue
+                for j in self._neighbors(i):
+                    if rhs[j] == INF:
+                        rhs[j] = rhs[i] + 1
+                        following.append(j)
+            self.touched.update(following)
+            layer = following
+            if reached:
+                break
+
+        for i in layer:
+            key = self._key(i)
+            self.queued[i] = key
+            self.queue.append((key, i))
+        heapq.heapify(self.queue)
+
+    def compute(self):
+        """Пересчитывает g, пока клетка агента не станет согласованной"""
+        start = self.start
+        g, rhs = self.g, self.rhs
+        while self.queue:
+            key, u = self.queue[0]
+            if self.queued.get(u) != key:
+                heapq.heappop(self.queue)
+                continue
+            if not (key < self._key(start) or rhs[start] != g[start]):
+                break
+
+            heapq.heappop(self.queue)
+            del self.queued[u]
+            self.expanded += 1
+            new_key = self._key(u)
+            if key < new_key:
+                self.queued[u] = new_key
+                heapq.heappush(self.queue, (new_key, u))
+            elif g[u] > rhs[u]:
+                g[u] = rhs[u]
+                for p in self._neighbors(u):
+                    self._update_vertex(p)
+            else:
+                g[u] = INF
+                self._update_vertex(u)
+                for p in self._neighbors(u):
+                    self._update_vertex(p)
+
+    def path(self) -> list:
+        """Кратчайший путь от агента до ближайшей цели или [], если цели недостижимы"""
+        current = self.start
+        if self.g[current] == INF:
+            return []
+
+        blocked, g = self.blocked, self.g
+        path = [self._cell(current)]
+        for _ in range(self.width * self.height):
+            if self.goal[current]:
+                return path
+            best, best_cost = None, INF
+            for v in self._neighbors(current):
+                if not blocked[v] and g[v] + 1 < best_cost:
+                    best, best_cost = v, g[v] + 1
+            if best is None:
+                return []
+            current = best
+            path.append(self._cell(current))
+        return []
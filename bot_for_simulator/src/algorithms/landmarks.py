@@ -0,0 +1,120 @@
+import os
+import zlib
+from array import array
+from collections import deque
+
+CACHE_DIR = os.environ.get("BOT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "reco-bot"))
+
+
+class LandmarkTable:
+    """
+    Эвристика ALT (A*, landmarks, triangle inequality) для неподвижных препятствий.
+
+    Для нескольких опорных клеток (landmarks) заранее считаются расстояния BFS до
+    всех клеток. По неравенству треугольника |d(L, a) - d(L, b)| <= d(a, b), поэтому
+    максимум по опорным клеткам (и манхэттенскому расстоянию) - допустимая и
+    согласованная оценка. NPC только удлиняют пути, так что оценка остается
+    допустимой и с ними.
+
+    Клетки нумеруются как в DStarLite: x * height + y; -1 - клетка недостижима.
+    """
+    def __init__(self, width: int, height: int, distances: list):
+        self.width = width
+        self.height = height
+        self.distances = distances
+        self.target = None
+        self.target_distances = []
+
+    @classmethod
+    def build(cls, width: int, height: int, blocked: bytearray, count: int = 8):
+        """
+        Опорные клетки выбираются по принципу самой удаленной точки: каждая следующая -
+        свободная клетка, дальше всех от уже выбранных.
+        """
+        free = [i for i in range(width * height) if not blocked[i]]
+        if not free:
+            return cls(width, height, [])
+
+        distances = []
+        # Первая опорная клетка - самая удаленная от произвольной свободной
+        seed_distances = cls._bfs(width, height, blocked, free[0])
+        landmark = max(free, key=lambda i: seed_distances[i])
+        nearest = array('i', [-1]) * (width * height)
+        for _ in range(min(count, len(free))):
+            table = cls._bfs(width, height, blocked, landmark)
+            distances.append(table)
+            for i in free:
+                d = table[i]
+                if d >= 0 and (nearest[i] < 0 or d < nearest[i]):
+                    nearest[i] = d
+            landmark = max(free, key=lambda i: nearest[i])
+            if nearest[landmark] <= 0:
+                break
+        return cls(width, height, distances)
+
+    @staticmethod
+    def _bfs(width: int, height: int, blocked: bytearray, source: int) -> array:
+        distances = array('i', [-1]) * (width * height)
+        distances[source] = 0
+        frontier = deque([source])
+        while frontier:
+            i = frontier.popleft()
+            x, y = divmod(i, height)
+            d = distances[i] + 1
+            for j, inside in ((i + 1, y < height - 1), (i + height, x < width - 1),
+                              (i - 1, y > 0), (i - height, x > 0)):
+                if inside and distances[j] < 0 and not blocked[j]:
+                    distances[j] = d
+                    frontier.append(j)
+        return distances
+
+    @staticmethod
+    def cache_path(seed, width: int, height: int, blocked: bytearray, count: int) -> str:
+        checksum = zlib.crc32(bytes(blocked))
+        return os.path.join(CACHE_DIR, f"landmarks-{seed}-{width}x{height}-{count}-{checksum:08x}.bin")
+
+    @classmethod
+    def load_or_build(cls, width: int, height: int, blocked: bytearray, seed, count: int = 8):
+        """
+        Таблица из дискового кэша (ключ - seed, размер и контрольная сумма препятствий)
+        или построенная заново и сохраненная в кэш.
+        """
+        path = cls.cache_path(seed, width, height, blocked, count)
+        cells = width * height
+        try:
+            with open(path, "rb") as f:
+                data = array('i')
+                data.frombytes(f.read())
+            if len(data) % cells == 0:
+                return cls(width, height, [data[k:k + cells] for k in range(0, len(data), cells)])
+        except OSError:
+            pass
+
+        table = cls.build(width, height, blocked, count)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                for distances in table.distances:
+                    distances.tofile(f)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass  # без кэша таблица просто строится при каждом запуске
+        return table
+
+    def set_target(self, target: int):
+        """Клетка, до которой оценивается расстояние (в D* Lite - клетка агента)"""
+        self.target = target
+        self.target_distances = [distances[target] for distances in self.distances]
+
+    def estimate(self, i: int) -> int:
+        """Нижняя оценка расстояния от клетки i до target"""
+        x, y = divmod(i, self.height)
+        tx, ty = divmod(self.target, self.height)
+        best = abs(x - tx) + abs(y - ty)
+        for distances, target_distance in zip(self.distances, self.target_distances):
+            d = distances[i]
+            if d >= 0 and target_distance >= 0:
+                bound = d - target_distance if d > target_distance else target_distance - d
+                if bound > best:
+                    best = bound
+        return best
@@ -0,0 +1,37 @@
+from array import array
+
+# До этого числа клеток состояние бота хранится плотными массивами,
+# на больших (чанковых) полях - разреженно: память растет с изученной площадью
+DENSE_CELLS_LIMIT = 1000 * 1000
+
+
+class SparseArray(dict):
+    """
+    Массив по номеру клетки, хранящий только записанные элементы;
+    остальные равны default. Чтение и запись - как у списка (a[i], a[i] = v).
+    """
+    def __init__(self, default):
+        super().__init__()
+        self.default = default
+
+    def __missing__(self, key):
+        return self.default
+
+
+def cell_array(size: int, default=0, typecode: str = None):
+    """
+    Массив из size клеток со значением default: плотный (bytearray при typecode None,
+    иначе array(typecode), либо список для нечисловых значений) или SparseArray
+    для полей больше DENSE_CELLS_LIMIT.
+    """
+    if size > DENSE_CELLS_LIMIT:
+        return SparseArray(default)
+    if typecode is not None:
+        return array(typecode, [default]) * size
+    if isinstance(default, int) and 0 <= default < 256:
+        return bytearray([default]) * size
+    return [default] * size
+
+
+def is_sparse(values) -> bool:
+    return isinstance(values, SparseArray)
@@ -1,34 +1,78 @@
-import requests
-import time
+import argparse
+import asyncio
 import multiprocessing
 import queue
+import time
+
 from algorithms.botai import BotAI
 from algorithms.astar import AStarBot
+from client import SimulatorClient, AsyncSimulatorClient, SimulatorError, RetryPolicy
 from visualizator.visual_main import visualization_process
 
 
-def send_command(command: dict = None, server_url: str = None) -> dict:
+def points_to_pairs(points: list) -> list:
+    """Список точек в любом формате ответа -> список кортежей (x, y)"""
+    if points and isinstance(points[0], dict):
+        return [(p["x"], p["y"]) for p in points]
+    return list(zip(points[0::2], points[1::2]))
+
+
+class ResyncRequired(Exception):
+    """Пропущено разностное наблюдение - нужно запросить полную синхронизацию"""
+
+
+class ObservationReconstructor:
     """
-    Отправляет команду на сервер.
-    Если команда не указана, отправляет {"command": "attack"} по умолчанию.
+    Восстанавливает полный ответ /command из разностных наблюдений
+    (команды с "observation": "delta"), чтобы parse_state и боты работали без изменений.
     """
+    KINDS = ("npcs", "resources", "obstacles")
+
+    def __init__(self):
+        self.seq = None
+        self.visible = {kind: set() for kind in self.KINDS}
+
+    def apply(self, response: dict) -> dict:
+        if "delta" not in response:
+            # Полное наблюдение заменяет накопленное состояние
+            self.seq = None
+            self.visible = {
+                kind: set(points_to_pairs(response["visible_entities"][kind]))
+                for kind in self.KINDS
+            }
+            return response
+
+        delta = response["delta"]
+        if delta["resync"]:
+            self.visible = {kind: set() for kind in self.KINDS}
+        elif self.seq is None or response["seq"] != self.seq + 1:
+            raise ResyncRequired(f"Unexpected seq {response['seq']} after {self.seq}")
+        self.seq = response["seq"]
+
+        for kind in self.KINDS:
+            self.visible[kind] -= set(points_to_pairs(delta["disappeared"][kind]))
+            self.visible[kind] |= set(points_to_pairs(delta["appeared"][kind]))
+        for move in delta["moved"]["npcs"]:
+            self.visible["npcs"].discard((move["from"]["x"], move["from"]["y"]))
+            self.visible["npcs"].add((move["to"]["x"], move["to"]["y"]))
+
+        full = {key: value for key, value in response.items() if key not in ("delta", "seq")}
+        full["visible_entities"] = {
+            kind: [{"x": x, "y": y} for x, y in sorted(self.visible[kind])]
+            for kind in self.KINDS
+        }
+        return full
+
+
+def parse_static_map(response: dict) -> dict:
+    """Ответ /static-map -> конфигурация static_map для AStarBot"""
+    return {
+        "width": response["width"],
+        "height": response["height"],
+        "seed": response["seed"],
+        "obstacles": points_to_pairs(response["obstacles"])
+    }
 
-    if command is None:
-        command = {"command": "attack"}
-    
-    while True:
-        try:
-            response = requests.post(server_url, json=command)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Server error: {response.status_code}, retrying...")
-                time.sleep(1)
-        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
-            time.sleep(1)
-        except Exception as e:
-            print(f"Network error: {str(e)}")
-            time.sleep(1)
 
 def parse_state(response: dict) -> dict:
     """Преобразует сырой ответ сервера в структурированное состояние"""
@@ -39,17 +83,134 @@ def parse_state(response: dict) -> dict:
             "x": response["agent"]["x"],
             "y": response["agent"]["y"]
         },
-        "npcs": [(n["x"], n["y"]) for n in response["visible_entities"]["npcs"]],
-        "resources": [(r["x"], r["y"]) for r in response["visible_entities"]["resources"]],
-        "obstacles": [(o["x"], o["y"]) for o in response["visible_entities"]["obstacles"]],
+        "npcs": points_to_pairs(response["visible_entities"]["npcs"]),
+        "resources": points_to_pairs(response["visible_entities"]["resources"]),
+        "obstacles": points_to_pairs(response["visible_entities"]["obstacles"]),
         "score": response["score"],
         "respawns": response["respawns"]
     }
 
+class BotDriver:
+    """
+    Один бот поверх разностных наблюдений: собирает следующую команду
+    и превращает ответ сервера в ход бота.
+    """
+    def __init__(self, bot, vision_radius: int):
+        self.bot = bot
+        self.vision_radius = vision_radius
+        # Сервер присылает только изменения видимой области, полный ответ собираем локально
+        self.reconstructor = ObservationReconstructor()
+        self.resync = False
+        self.current_command = None
+
+    def next_command(self) -> dict:
+        # По умолчанию (первый такт, после ресинхронизации) - attack
+        return dict(self.current_command or {"command": "attack"}, observation="delta", resync=self.resync)
+
+    def handle(self, raw_response: dict):
+        """(состояние, данные визуализации) или None, если нужна ресинхронизация"""
+        try:
+            raw_response = self.reconstructor.apply(raw_response)
+            self.resync = False
+        except ResyncRequired:
+            self.resync = True
+            self.current_command = None
+            return None
+
+        parsed_state = parse_state(raw_response)
+        parsed_state["vision_radius"] = self.vision_radius
+        self.current_command, viz_data = self.bot.step(parsed_state)
+        return parsed_state, viz_data
+
+
+WORLD_CONFIG = {
+    "field_size": 50,
+    "npc_count": 100,
+    "resource_count": 200,
+    "obstacle_percent": 15,
+    "npc_movement": True,
+    "agent_vision_radius": 5
+}
+
+
+async def run_bots_async(base_url: str, count: int, ticks: int, static_map: bool = False,
+                         landmarks: int = 0) -> list:
+    """
+    count ботов в одном цикле событий, у каждого своя сессия симулятора.
+    Соединения берутся из общего пула одной aiohttp.ClientSession.
+    Возвращает итоговые состояния ботов.
+    """
+    import aiohttp
+
+    async def play(http, seed):
+        client = AsyncSimulatorClient(base_url, http=http)
+        response = await client.init(dict(WORLD_CONFIG, seed=seed))
+        vision_radius = response["parameters"]["agent_vision_radius"]
+        bot_config = {"vision_radius": vision_radius, "landmarks": landmarks}
+        if static_map:
+            bot_config["static_map"] = parse_static_map(await client.static_map())
+        driver = BotDriver(AStarBot(config=bot_config), vision_radius)
+        state = None
+        try:
+            for _ in range(ticks):
+                result = driver.handle(await client.command(driver.next_command()))
+                if result is not None:
+                    state = result[0]
+        finally:
+            await client.close()
+        return state
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=count)) as http:
+        return await asyncio.gather(*(play(http, seed) for seed in range(1, count + 1)))
+
+
+def run_bot(base_url: str, viz_queue=None, static_map: bool = False, landmarks: int = 0):
+    """Бот против уже инициализированной игры на сервере (единственной активной сессии)"""
+    # Бесконечные повторы: бот ждет, пока сервер снова станет доступен
+    with SimulatorClient(base_url, retry=RetryPolicy(max_retries=None)) as client:
+        vision_radius = client.status().get("parameters", {}).get("agent_vision_radius", 5)
+        bot_config = {"vision_radius": vision_radius, "landmarks": landmarks}
+        if static_map:
+            bot_config["static_map"] = parse_static_map(client.static_map())
+        driver = BotDriver(AStarBot(config=bot_config), vision_radius)
+
+        while True:
+            try:
+                result = driver.handle(client.command(driver.next_command()))
+            except SimulatorError as e:
+                print(f"Server error: {e.status} {e.payload}")
+                if e.status == 404:
+                    time.sleep(1)  # игра еще не инициализирована
+                driver.current_command = None
+                continue
+            if result is None or viz_queue is None:
+                continue
+
+            # Отправляем данные в визуализатор
+            try:
+                viz_queue.put_nowait(result)
+            except queue.Full:
+                pass  # Пропускаем кадр если очередь заполнена
+
+
 if __name__ == "__main__":
-    SERVER_URL = "http://0.0.0.0:5000/command"
-    VISION_RADIUS = 5
-    
+    parser = argparse.ArgumentParser(description="Bot for the grid simulator")
+    parser.add_argument("--server", default="http://0.0.0.0:5000")
+    parser.add_argument("--bots", type=int, default=0,
+                        help="run N bots in separate sessions over one event loop (requires aiohttp)")
+    parser.add_argument("--ticks", type=int, default=1000, help="ticks per bot with --bots")
+    parser.add_argument("--static-map", action="store_true",
+                        help="fetch the obstacle map up front")
+    parser.add_argument("--landmarks", type=int, default=0,
+                        help="with --static-map: plan with N ALT landmarks cached on disk (off by default)")
+    args = parser.parse_args()
+
+    if args.bots:
+        states = asyncio.run(run_bots_async(args.server, args.bots, args.ticks, args.static_map, args.landmarks))
+        scores = [state["score"] for state in states if state]
+        print(f"Bots: {len(scores)} | Mean score: {sum(scores) / max(len(scores), 1):.1f}")
+        raise SystemExit
+
     # Создаем очередь для визуализации
     viz_queue = multiprocessing.Queue(maxsize=1)
     
@@ -62,40 +223,9 @@ if __name__ == "__main__":
     visualizer.start()
     print("Visualizer process started with PID:", visualizer.pid)
 
-    # Инициализируем бота
-    bot = AStarBot(config={"vision_radius": VISION_RADIUS})
-    
     try:
-        # Начинаем без начальной команды
-        current_command = None
-        
-        while True:
-            # Отправляем команду (по умолчанию attack) и получаем ответ
-            raw_response = send_command(current_command, SERVER_URL)
-            
-            if not raw_response:
-                print("Server unavailable, retrying...")
-                time.sleep(1)
-                continue
-            
-            # Парсим состояние
-            parsed_state = parse_state(raw_response)
-            
-            # Добавляем радиус видимости
-            parsed_state["vision_radius"] = VISION_RADIUS
-            
-            # Получаем решение от бота для следующего шага
-            current_command, viz_data = bot.step(parsed_state)
-
-            # Отправляем данные в визуализатор
-            try:
-                viz_queue.put_nowait((parsed_state, viz_data))
-            except queue.Full:
-                pass  # Пропускаем кадр если очередь заполнена
-            
-            time.sleep(1)
-            
+        run_bot(args.server, viz_queue, args.static_map, args.landmarks)
     except KeyboardInterrupt:
         print("\nBot stopped")
     finally:
-        print("Shutting down")
\ No newline at end of file
+        print("Shutting down")
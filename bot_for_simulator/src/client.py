@@ -0,0 +1,246 @@
+"""
+Клиент API симулятора.
+
+    client = SimulatorClient("http://localhost:5000")
+    client.init(config)
+    observation = client.command({"command": "attack"})
+
+SimulatorClient держит постоянные соединения (requests.Session с пулом),
+повторяет запрос при сетевых ошибках и ответах 502/503/504 с экспоненциальной
+задержкой и случайным разбросом, пока не исчерпан бюджет повторов.
+AsyncSimulatorClient - то же на aiohttp (необязательная зависимость): один цикл
+событий и одна aiohttp.ClientSession обслуживают много ботов одновременно.
+
+Повтор /command после таймаута может выполнить такт дважды, если сервер успел
+его обработать: сервер не отличает повтор от новой команды.
+"""
+import asyncio
+import json
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import msgpack
+except ImportError:  # без msgpack общаемся с сервером в JSON
+    msgpack = None
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp нужен только для AsyncSimulatorClient
+    aiohttp = None
+
+
+MSGPACK_MIMETYPE = "application/msgpack"
+RETRY_STATUSES = (502, 503, 504)
+
+
+class SimulatorError(Exception):
+    """Ответ сервера с ошибкой (4xx/5xx)"""
+    def __init__(self, status: int, payload):
+        super().__init__(f"Server error {status}: {payload}")
+        self.status = status
+        self.payload = payload
+
+
+class SimulatorUnavailable(Exception):
+    """Сервер недоступен, бюджет повторов исчерпан"""
+
+
+class RetryPolicy:
+    """
+    Экспоненциальная задержка с полным случайным разбросом:
+    перед повтором n (с нуля) - случайная пауза от 0 до min(max_delay, base_delay * 2**n).
+    max_retries=None - повторять бесконечно.
+    """
+    def __init__(self, max_retries: int = 5, base_delay: float = 0.1, max_delay: float = 5.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delays(self):
+        attempt = 0
+        while self.max_retries is None or attempt < self.max_retries:
+            yield random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            attempt += 1
+
+
+def accept_header() -> dict:
+    return {"Accept": f"{MSGPACK_MIMETYPE}, application/json;q=0.5"} if msgpack else {}
+
+
+def decode_body(content_type: str, content: bytes):
+    """JSON или MessagePack (координаты сущностей - плоские массивы [x0, y0, x1, y1, ...])"""
+    if msgpack and content_type.startswith(MSGPACK_MIMETYPE):
+        return msgpack.unpackb(content, raw=False)
+    return json.loads(content) if content else None
+
+
+def decode_response(response: requests.Response):
+    return decode_body(response.headers.get("Content-Type", ""), response.content)
+
+
+class SimulatorClient:
+    """
+    Синхронный клиент. timeout - (подключение, чтение) в секундах.
+    После init() запросы адресуются созданной сессии симулятора;
+    без session_id сервер использует единственную активную сессию.
+    """
+    def __init__(self, base_url: str = "http://localhost:5000", session_id: str = None,
+                 timeout=(3.05, 30), retry: RetryPolicy = None, pool_size: int = 4):
+        self.base_url = base_url.rstrip("/")
+        self.session_id = session_id
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+        self.http.headers.update(accept_header())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.http.close()
+
+    def _headers(self):
+        return {"X-Session-Id": self.session_id} if self.session_id else {}
+
+    def request(self, method: str, path: str, payload: dict = None, params: dict = None):
+        """Запрос с повторами; SimulatorError для ответов с ошибкой"""
+        delays = self.retry.delays()
+        while True:
+            try:
+                response = self.http.request(method, self.base_url + path, json=payload, params=params,
+                                             headers=self._headers(), timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                reason = f"status {response.status_code}"
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                reason = str(e)
+            delay = next(delays, None)
+            if delay is None:
+                raise SimulatorUnavailable(f"{method} {path} failed: {reason}")
+            time.sleep(delay)
+
+        body = decode_response(response)
+        if response.status_code >= 400:
+            raise SimulatorError(response.status_code, body)
+        return body
+
+    def init(self, config: dict) -> dict:
+        response = self.request("POST", "/init", config)
+        self.session_id = response.get("session_id")
+        return response
+
+    def command(self, command: dict = None) -> dict:
+        """Один такт; без команды - {"command": "attack"}"""
+        return self.request("POST", "/command", command or {"command": "attack"})
+
+    def batch(self, commands: list, responses: str = "last") -> dict:
+        """Несколько тактов за один запрос (/command/batch)"""
+        return self.request("POST", "/command/batch", {"commands": commands, "responses": responses})
+
+    def full_state(self) -> dict:
+        return self.request("GET", "/full-state")
+
+    def static_map(self) -> dict:
+        """Неподвижные препятствия мира (/static-map)"""
+        return self.request("GET", "/static-map")
+
+    def status(self) -> dict:
+        return self.request("GET", "/status")
+
+    def close(self):
+        """Закрывает сессию симулятора и соединения"""
+        try:
+            if self.session_id:
+                self.request("DELETE", "/session")
+        finally:
+            self.http.close()
+
+
+class AsyncSimulatorClient:
+    """
+    Асинхронный клиент на aiohttp с теми же методами, что SimulatorClient.
+    Несколько клиентов могут делить одну aiohttp.ClientSession (http) -
+    тогда соединения берутся из ее общего пула.
+    """
+    def __init__(self, base_url: str = "http://localhost:5000", session_id: str = None,
+                 timeout: float = 30, retry: RetryPolicy = None, http=None):
+        if aiohttp is None:
+            raise RuntimeError("AsyncSimulatorClient requires aiohttp: pip install aiohttp")
+        self.base_url = base_url.rstrip("/")
+        self.session_id = session_id
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retry = retry or RetryPolicy()
+        self.http = http
+        self.owns_http = http is None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.owns_http and self.http is not None:
+            await self.http.close()
+
+    def _headers(self):
+        headers = accept_header()
+        if self.session_id:
+            headers["X-Session-Id"] = self.session_id
+        return headers
+
+    async def request(self, method: str, path: str, payload: dict = None, params: dict = None):
+        if self.http is None:
+            self.http = aiohttp.ClientSession()
+        delays = self.retry.delays()
+        while True:
+            try:
+                async with self.http.request(method, self.base_url + path, json=payload, params=params,
+                                             headers=self._headers(), timeout=self.timeout) as response:
+                    if response.status not in RETRY_STATUSES:
+                        status = response.status
+                        body = decode_body(response.headers.get("Content-Type", ""), await response.read())
+                        break
+                    reason = f"status {response.status}"
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                reason = str(e) or type(e).__name__
+            delay = next(delays, None)
+            if delay is None:
+                raise SimulatorUnavailable(f"{method} {path} failed: {reason}")
+            await asyncio.sleep(delay)
+
+        if status >= 400:
+            raise SimulatorError(status, body)
+        return body
+
+    async def init(self, config: dict) -> dict:
+        response = await self.request("POST", "/init", config)
+        self.session_id = response.get("session_id")
+        return response
+
+    async def command(self, command: dict = None) -> dict:
+        return await self.request("POST", "/command", command or {"command": "attack"})
+
+    async def batch(self, commands: list, responses: str = "last") -> dict:
+        return await self.request("POST", "/command/batch", {"commands": commands, "responses": responses})
+
+    async def full_state(self) -> dict:
+        return await self.request("GET", "/full-state")
+
+    async def static_map(self) -> dict:
+        return await self.request("GET", "/static-map")
+
+    async def status(self) -> dict:
+        return await self.request("GET", "/status")
+
+    async def close(self):
+        try:
+            if self.session_id:
+                await self.request("DELETE", "/session")
+        finally:
+            if self.owns_http and self.http is not None:
+                await self.http.close()
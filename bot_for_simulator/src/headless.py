@@ -0,0 +1,89 @@
+"""
+Запуск бота против встроенного движка симулятора без HTTP-сервера.
+
+    python headless.py --ticks 10000 --seed 42
+    python headless.py --ticks 10000 --seed 42 --trace game.jsonl.gz   # с записью для replay.py
+    python headless.py --ticks 10000 --field-size 2000 --npc-count 40000 --resource-count 80000
+"""
+import argparse
+import os
+import sys
+import time
+
+SIMULATION_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "simulator", "src", "simulation"
+)
+sys.path.insert(0, os.path.normpath(SIMULATION_DIR))
+
+from engine import SimulationEngine
+from algorithms.astar import AStarBot
+from bot import parse_state, parse_static_map
+
+DEFAULT_CONFIG = {
+    "field_size": 50,
+    "npc_count": 100,
+    "resource_count": 200,
+    "obstacle_percent": 15,
+    "npc_movement": True,
+    "agent_vision_radius": 5
+}
+
+
+def run_headless(bot, config: dict, ticks: int, engine: SimulationEngine = None, trace: str = None) -> dict:
+    """
+    Прогоняет бота ticks тактов во встроенном движке.
+    trace - файл записи игры для replay.py симулятора.
+    Возвращает последнее разобранное состояние.
+    """
+    engine = engine or SimulationEngine()
+    raw_response = engine.reset(config)
+    if trace:
+        engine.start_trace(trace)
+    vision_radius = engine.init_params()["agent_vision_radius"]
+    
+    for _ in range(ticks):
+        parsed_state = parse_state(raw_response)
+        parsed_state["vision_radius"] = vision_radius
+        command, _ = bot.step(parsed_state)
+        raw_response = engine.step(command)
+    
+    engine.stop_trace()
+    return parse_state(raw_response)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless bot run")
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--field-size", type=int, default=None,
+                        help="field size; above 100 the simulator builds a chunked world")
+    parser.add_argument("--npc-count", type=int, default=None)
+    parser.add_argument("--resource-count", type=int, default=None)
+    parser.add_argument("--trace", help="record the game to this file (replay with simulator replay.py)")
+    parser.add_argument("--static-map", action="store_true",
+                        help="give the bot the obstacle map up front")
+    parser.add_argument("--landmarks", type=int, default=0,
+                        help="with --static-map: plan with N ALT landmarks cached on disk (off by default)")
+    args = parser.parse_args()
+    
+    config = dict(DEFAULT_CONFIG)
+    if args.seed is not None:
+        config["seed"] = args.seed
+    for key in ("field_size", "npc_count", "resource_count"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    
+    bot_config = {"vision_radius": config["agent_vision_radius"], "landmarks": args.landmarks}
+    engine = SimulationEngine()
+    if args.static_map:
+        engine.reset(config)
+        config["seed"] = engine.init_params()["seed"]
+        bot_config["static_map"] = parse_static_map(engine.static_map())
+    bot = AStarBot(config=bot_config)
+    
+    started = time.perf_counter()
+    final_state = run_headless(bot, config, args.ticks, engine, args.trace)
+    elapsed = time.perf_counter() - started
+    
+    print(f"Ticks: {args.ticks} | Score: {final_state['score']} | "
+          f"Respawns: {final_state['respawns']} | {args.ticks / elapsed:.0f} ticks/s")
@@ -1,29 +1,27 @@
 import os
-import time
 import multiprocessing
 import queue
 
 def visualization_process(viz_queue: multiprocessing.Queue):
     """Процесс визуализации игрового состояния с помощью emoji"""
     print("Emoji visualizer started")
-    last_state = None
     
     while True:
         try:
-            state, viz_data = viz_queue.get(timeout=0.1)
-            last_state = state
-        except queue.Empty:
-            pass
+            # Ждем следующий кадр, затем забираем самый свежий из накопившихся
+            state, viz_data = viz_queue.get()
+            while True:
+                try:
+                    state, viz_data = viz_queue.get_nowait()
+                except queue.Empty:
+                    break
         except KeyboardInterrupt:
             break
         except Exception as e:
             print(f"Visualizer error: {str(e)}")
             continue
         
-        if last_state:
-            display_game(last_state, viz_data)
-        
-        time.sleep(1)
+        display_game(state, viz_data or {})
 
 def display_game(state: dict, viz_data: dict):
     """Визуализация игрового поля с помощью emoji"""
@@ -0,0 +1,278 @@
+"""
+Набор бенчмарков горячих путей симулятора и бота.
+
+    python benchmark.py --output results.json
+    python benchmark.py --compare results.json --threshold 0.2
+    python benchmark.py --filter tick --quick
+
+Каждый замер повторяется repeat раз по number операций; в результатах - медиана
+и минимум времени одной операции в микросекундах. Миры создаются с фиксированным
+seed, поэтому замеры одного и того же кода повторяемы. Результаты сохраняются
+в JSON и сравниваются с сохраненными ранее: замер медленнее эталона больше чем
+на threshold считается регрессией (код выхода 1).
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+QA_DIR = os.path.dirname(os.path.abspath(__file__))
+SIMULATION_DIR = os.path.normpath(os.path.join(QA_DIR, "..", "src", "simulation"))
+BOT_DIR = os.path.normpath(os.path.join(QA_DIR, "..", "..", "bot_for_simulator", "src"))
+sys.path.insert(0, SIMULATION_DIR)
+sys.path.insert(0, BOT_DIR)
+
+import numpy as np
+from encoding import encode_json
+from engine import SimulationEngine
+from game_logic import process_game_tick, calculate_visible_entities
+from game_objects import GameWorld
+from chunked_world import create_world
+from validation import validate_init_params
+from algorithms.astar import AStarBot
+from bot import parse_state
+
+SEED = 12345
+DIRECTIONS = ("up", "right", "down", "left")
+
+
+def world_config(**overrides):
+    config = {
+        "field_size": 100,
+        "seed": SEED,
+        "npc_count": 100,
+        "resource_count": 200,
+        "obstacle_percent": 15,
+        "npc_movement": True,
+        "agent_vision_radius": 5,
+    }
+    config.update(overrides)
+    errors, validated = validate_init_params(config)
+    if errors:
+        raise ValueError(f"Invalid benchmark config {config}: {errors}")
+    return validated
+
+
+def commands():
+    """Бесконечная детерминированная последовательность ходов агента"""
+    step = 0
+    while True:
+        yield {"command": "move", "direction": DIRECTIONS[(step // 7) % 4]}
+        step += 1
+
+
+# Каждый бенчмарк - функция параметров, возвращающая run(number) -> секунды на number операций.
+# Подготовка (создание мира и т.п.) в замер не входит.
+
+def bench_world_init(field_size, obstacle_percent):
+    config = world_config(field_size=field_size, obstacle_percent=obstacle_percent,
+                          npc_count=field_size * field_size // 20, resource_count=field_size * field_size // 20)
+
+    def run(number):
+        started = time.perf_counter()
+        for _ in range(number):
+            GameWorld(config)
+        return time.perf_counter() - started
+    return run
+
+
+def bench_chunked_init(field_size):
+    """Чанковый мир: создается только чанк агента, время не должно расти с field_size"""
+    config = world_config(field_size=field_size, npc_count=field_size * field_size // 100,
+                          resource_count=field_size * field_size // 50)
+
+    def run(number):
+        started = time.perf_counter()
+        for _ in range(number):
+            create_world(config)
+        return time.perf_counter() - started
+    return run
+
+
+def bench_chunked_tick(field_size):
+    """Такт чанкового мира, включая создание чанков на пути агента и после респавнов"""
+    world = create_world(world_config(field_size=field_size, npc_count=field_size * field_size // 100,
+                                      resource_count=field_size * field_size // 50))
+    moves = commands()
+
+    def run(number):
+        started = time.perf_counter()
+        for _ in range(number):
+            process_game_tick(world, next(moves))
+        return time.perf_counter() - started
+    return run
+
+
+def bench_tick(npc_count, npc_movement):
+    world = GameWorld(world_config(npc_count=npc_count, npc_movement=npc_movement))
+    moves = commands()
+
+    def run(number):
+        started = time.perf_counter()
+        for _ in range(number):
+            process_game_tick(world, next(moves))
+        return time.perf_counter() - started
+    return run
+
+
+def bench_visibility(vision_radius):
+    world = GameWorld(world_config(npc_count=1000, resource_count=1000, agent_vision_radius=vision_radius))
+
+    def run(number):
+        started = time.perf_counter()
+        for _ in range(number):
+            calculate_visible_entities(world)
+        return time.perf_counter() - started
+    return run
+
+
+def bench_full_state(field_size):
+    world = GameWorld(world_config(field_size=field_size, npc_count=field_size * field_size // 10,
+                                   resource_count=field_size * field_size // 10, obstacle_percent=30))
+
+    def run(number):
+        started = time.perf_counter()
+        for _ in range(number):
+            encode_json(world.get_full_state())
+        return time.perf_counter() - started
+    return run
+
+
+def bench_bot_step(field_size, static_map=False, obstacle_percent=15, landmarks=0):
+    """Только AStarBot.step; такты движка между шагами бота в замер не входят"""
+    engine = SimulationEngine()
+    config = world_config(field_size=field_size, npc_count=field_size * field_size // 40,
+                          resource_count=field_size * field_size // 40, obstacle_percent=obstacle_percent)
+    observation = engine.reset(config)
+    bot_config = {"vision_radius": config["agent_vision_radius"], "landmarks": landmarks}
+    if static_map:
+        from bot import parse_static_map
+        bot_config["static_map"] = parse_static_map(engine.static_map())
+    bot = AStarBot(config=bot_config)
+
+    def run(number):
+        nonlocal observation
+        elapsed = 0.0
+        for _ in range(number):
+            state = parse_state(observation)
+            state["vision_radius"] = config["agent_vision_radius"]
+            started = time.perf_counter()
+            command, _ = bot.step(state)
+            elapsed += time.perf_counter() - started
+            observation = engine.step(command)
+        return elapsed
+    return run
+
+
+def cases():
+    """(имя, параметры, фабрика, операций в повторе)"""
+    for field_size in (10, 50, 100):
+        for obstacle_percent in (0, 15, 30):
+            yield (f"world_init[size={field_size},obstacles={obstacle_percent}]",
+                   {"field_size": field_size, "obstacle_percent": obstacle_percent}, bench_world_init, 5)
+    for npc_count in (0, 100, 1000):
+        for npc_movement in (False, True):
+            yield (f"tick[npcs={npc_count},movement={str(npc_movement).lower()}]",
+                   {"npc_count": npc_count, "npc_movement": npc_movement}, bench_tick, 500)
+    for field_size in (1000, 10000):
+        yield (f"chunked_init[size={field_size}]", {"field_size": field_size}, bench_chunked_init, 5)
+    yield ("chunked_tick[size=2000]", {"field_size": 2000}, bench_chunked_tick, 500)
+    for vision_radius in (5, 10, 25, 50, 100):
+        yield (f"visibility[radius={vision_radius}]", {"vision_radius": vision_radius}, bench_visibility, 500)
+    for field_size in (50, 100):
+        yield (f"full_state[size={field_size}]", {"field_size": field_size}, bench_full_state, 20)
+    for field_size in (50, 100):
+        yield (f"bot_step[size={field_size}]", {"field_size": field_size}, bench_bot_step, 200)
+    yield ("bot_step[size=100,static_map=true]", {"field_size": 100, "static_map": True}, bench_bot_step, 200)
+    yield ("bot_step[size=100,static_map=true,landmarks=8]",
+           {"field_size": 100, "static_map": True, "landmarks": 8}, bench_bot_step, 200)
+    yield ("bot_step[size=100,obstacles=30,static_map=true]",
+           {"field_size": 100, "obstacle_percent": 30, "static_map": True}, bench_bot_step, 200)
+
+
+def measure(factory, params, number, repeat):
+    run = factory(**params)
+    run(max(1, number // 10))  # прогрев: кэши, первые планы бота
+    timings = [run(number) / number * 1e6 for _ in range(repeat)]
+    return {
+        "params": params,
+        "number": number,
+        "repeat": repeat,
+        "median_us": round(statistics.median(timings), 3),
+        "min_us": round(min(timings), 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=QA_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(pattern=None, repeat=5, scale=1.0):
+    results = {}
+    for name, params, factory, number in cases():
+        if pattern and not re.search(pattern, name):
+            continue
+        results[name] = measure(factory, params, max(1, int(number * scale)), repeat)
+        print(f"{name:45} {results[name]['median_us']:>12.1f} us", file=sys.stderr)
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Список (имя, эталон, текущее, отношение, регрессия) для замеров, которые есть в обоих"""
+    rows = []
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        ratio = result["median_us"] / reference["median_us"] if reference["median_us"] else float("inf")
+        rows.append((name, reference["median_us"], result["median_us"], ratio, ratio > 1 + threshold))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulator and bot benchmarks")
+    parser.add_argument("--filter", help="run only benchmarks whose name matches this regex")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="fewer operations per repeat (noisier)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file produced by --output")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="relative slowdown of the median counted as a regression (default 0.15)")
+    args = parser.parse_args()
+
+    current = run_suite(args.filter, args.repeat, 0.2 if args.quick else 1.0)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+            f.write("\n")
+    else:
+        print(json.dumps(current, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(current, baseline, args.threshold)
+        print(f"\nBaseline {baseline['meta'].get('revision')} -> {current['meta'].get('revision')}", file=sys.stderr)
+        for name, reference, value, ratio, regressed in rows:
+            mark = "REGRESSION" if regressed else ""
+            print(f"{name:45} {reference:>12.1f} {value:>12.1f} {ratio:>7.2f}x {mark}", file=sys.stderr)
+        if any(row[4] for row in rows):
+            sys.exit(1)
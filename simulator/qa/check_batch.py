@@ -0,0 +1,72 @@
+"""
+Проверка пакетного движка: мир k из BatchEngine должен повторять независимый
+SimulationEngine с той же конфигурацией и npc_update_mode='sequential'.
+
+    python check_batch.py
+    python check_batch.py --worlds 16 --ticks 2000 --field-size 30
+
+На каждом такте всем мирам подаются случайные команды (движение со столкновениями,
+атака), наблюдения сравниваются целиком. Код выхода 1 при первом расхождении.
+"""
+import argparse
+import os
+import random
+import sys
+
+QA_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.normpath(os.path.join(QA_DIR, "..", "src", "simulation")))
+
+from batch_engine import BatchEngine
+from engine import SimulationEngine
+from game_logic import DIRECTIONS
+
+
+def random_command(rng):
+    if rng.random() < 0.2:
+        return {"command": "attack"}
+    return {"command": "move", "direction": rng.choice(DIRECTIONS)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение BatchEngine с независимыми движками")
+    parser.add_argument("--worlds", type=int, default=8)
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--field-size", type=int, default=20)
+    args = parser.parse_args()
+
+    configs = []
+    for k in range(args.worlds):
+        configs.append({
+            "field_size": args.field_size,
+            "obstacle_percent": 10 + k % 3 * 5,
+            "npc_count": args.field_size * args.field_size // 20,
+            "resource_count": args.field_size,
+            "agent_vision_radius": 5 + k % 4,
+            "npc_movement": k % 4 != 3,
+            "npc_update_mode": "sequential",
+            "seed": k + 1,
+        })
+
+    batch = BatchEngine(configs)
+    engines = []
+    for config in configs:
+        engine = SimulationEngine()
+        engine.reset(config)
+        engines.append(engine)
+
+    rng = random.Random(0)
+    for tick in range(1, args.ticks + 1):
+        commands = [random_command(rng) for _ in configs]
+        batch.step(commands)
+        for k, (engine, command) in enumerate(zip(engines, commands)):
+            expected = engine.step(command)
+            if batch.observe(k) != expected:
+                print(f"mismatch: world {k}, tick {tick}, command {command}")
+                return 1
+
+    print(f"ok: {args.worlds} worlds x {args.ticks} ticks")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
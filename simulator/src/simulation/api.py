@@ -0,0 +1,316 @@
+"""
+Обработчики API, не зависящие от веб-сервера. Их используют Flask-сервер (main.py)
+и ASGI-сервер (asgi_app.py), поэтому маршруты и ответы у них одинаковые.
+Каждый обработчик возвращает (payload, status); успешные ответы (200) кодируются
+в формате из заголовка Accept, ошибки - всегда JSON.
+Обращения к движку выполняются под блокировкой сессии и могут блокировать поток,
+поэтому ASGI-сервер вызывает их вне цикла событий.
+"""
+import logging
+import os
+import re
+import time
+from engine import SimulationEngine, EngineError
+from checkpoint import CheckpointError
+from sessions import SessionLimitError
+
+logger = logging.getLogger(__name__)
+
+# Каталог для записей игр (recording.py): каждая сессия пишет <session_id>.jsonl.gz
+TRACE_DIR = os.environ.get('SIMULATOR_TRACE_DIR')
+TRACE_SNAPSHOT_INTERVAL = int(os.environ.get('SIMULATOR_TRACE_SNAPSHOT_INTERVAL', 1000))
+# Каталог сохранений миров (checkpoint.py); без него POST /session/checkpoint недоступен
+CHECKPOINT_DIR = os.environ.get('SIMULATOR_CHECKPOINT_DIR')
+CHECKPOINT_NAME = re.compile(r'[0-9a-f]{32}-[0-9]+')
+MAX_FORKS = 64
+
+
+def checkpoint_path(name):
+    return os.path.join(CHECKPOINT_DIR, f'{name}.npz')
+
+GAME_NOT_FOUND = {
+    'error': 'game_not_found',
+    'message': 'Game state not initialized'
+}
+GAME_NOT_INITIALIZED = {
+    "error": "game_not_initialized",
+    "solution": "Call POST /init first"
+}
+
+
+def session_required(sessions, session_id):
+    """Ошибка, если session_id не указан, а активных сессий несколько"""
+    if session_id is None and len(sessions) > 1:
+        return {
+            'error': 'session_required',
+            'details': 'Several sessions are active, pass session_id'
+        }, 400
+    return None
+
+
+def not_acceptable(mimetypes):
+    return {
+        'error': 'not_acceptable',
+        'details': f'Supported formats: {", ".join(mimetypes)}'
+    }, 406
+
+
+def init_game(sessions, config):
+    """Новая игра по параметрам или из сохранения: {"checkpoint": "<имя из /session/checkpoint>"}"""
+    engine = SimulationEngine()
+    session_id = sessions.new_id()
+    trace_path = os.path.join(TRACE_DIR, f'{session_id}.jsonl.gz') if TRACE_DIR else None
+    try:
+        if isinstance(config, dict) and 'checkpoint' in config:
+            error = restore_checkpoint(engine, config['checkpoint'])
+            if error:
+                return error
+        else:
+            engine.reset(config)
+        # Запись начинается до регистрации сессии, чтобы в нее попал каждый такт
+        if trace_path:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            engine.start_trace(trace_path, TRACE_SNAPSHOT_INTERVAL)
+        session = sessions.create(engine, session_id)
+    except EngineError as e:
+        return {'error': e.error, 'details': e.details}, 400
+    except SessionLimitError as e:
+        engine.stop_trace()
+        if trace_path:
+            os.remove(trace_path)
+        return {'error': 'too_many_sessions', 'details': str(e)}, 503
+    except RuntimeError as e:
+        return {'error': 'initialization_failed', 'details': str(e)}, 500
+
+    return {
+        'status': 'game_initialized',
+        'session_id': session.id,
+        'parameters': engine.init_params()
+    }, 200
+
+
+def restore_checkpoint(engine, name):
+    """None или ответ с ошибкой"""
+    if not CHECKPOINT_DIR or not isinstance(name, str) or not CHECKPOINT_NAME.fullmatch(name):
+        return {'error': 'checkpoint_not_found', 'details': f'No checkpoint {name!r}'}, 404
+    try:
+        engine.load(checkpoint_path(name))
+    except FileNotFoundError:
+        return {'error': 'checkpoint_not_found', 'details': f'No checkpoint {name!r}'}, 404
+    except (CheckpointError, OSError, ValueError) as e:
+        logger.exception('Checkpoint %s could not be loaded', name)
+        return {'error': 'checkpoint_invalid', 'details': str(e)}, 400
+    return None
+
+
+def save_checkpoint(session):
+    """Сохраняет мир сессии; имя сохранения передается в /init для восстановления"""
+    if not CHECKPOINT_DIR:
+        return {
+            'error': 'checkpoints_disabled',
+            'details': 'Set SIMULATOR_CHECKPOINT_DIR to enable checkpoints'
+        }, 404
+
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    with session.lock:
+        name = f'{session.id}-{session.engine.gameworld.version}'
+        # Через временный файл: прерванная запись не оставит испорченное сохранение
+        with open(checkpoint_path(name) + '.tmp', 'wb') as f:
+            session.engine.save(f)
+        os.replace(checkpoint_path(name) + '.tmp', checkpoint_path(name))
+    return {'status': 'checkpoint_saved', 'session_id': session.id, 'checkpoint': name}, 200
+
+
+def fork_session(sessions, session, data):
+    """Тело: {"count": N} - N новых сессий с копиями мира на текущем такте"""
+    count = data.get('count', 1) if isinstance(data, dict) else 1
+    if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= MAX_FORKS:
+        return {
+            'error': 'invalid_params',
+            'details': [f'count must be an integer between 1 and {MAX_FORKS}']
+        }, 400
+
+    with session.lock:
+        engines = session.engine.fork(count)
+    children = []
+    try:
+        for engine in engines:
+            children.append(sessions.create(engine))
+    except SessionLimitError as e:
+        for child in children:
+            sessions.remove(child.id)
+        return {'error': 'too_many_sessions', 'details': str(e)}, 503
+
+    return {
+        'status': 'session_forked',
+        'session_id': session.id,
+        'sessions': [child.id for child in children]
+    }, 200
+
+
+def status(sessions, session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        if session_id is None and len(sessions) > 1:
+            return {'status': 'launched', 'sessions': len(sessions)}, 200
+        return {'status': 'not initialized'}, 200
+
+    try:
+        with session.lock:
+            parameters = session.engine.init_params()
+        return {
+            'status': 'launched',
+            'session_id': session.id,
+            'parameters': parameters
+        }, 200
+    except Exception as e:
+        return {
+            'status': 'launched',
+            'error': f'Error retrieving parameters: {str(e)}'
+        }, 200
+
+
+def static_map(session):
+    with session.lock:
+        return session.engine.static_map(), 200
+
+
+# Ответы с ETag зависят от сессии (ее можно выбрать заголовком) и формата
+ETAG_VARY = 'Accept, X-Session-Id'
+
+
+def static_map_etag(session, mimetype):
+    """Карта препятствий не меняется за время жизни сессии"""
+    return f'static-{session.id}-{mimetype}'
+
+
+def state_etag(session, version, mimetype):
+    """
+    Версия состояния уникальна только внутри сессии: копии (/session/fork) и восстановленные
+    миры продолжают нумерацию исходного, но каждый из них - отдельная сессия
+    """
+    return f'{session.id}-{version}-{mimetype}'
+
+
+def run_command(session, data, stats):
+    """Один такт: команда, наблюдение (полное или разностное), оповещение ожидающих"""
+    try:
+        with session.lock:
+            started = time.perf_counter()
+            observation = session.engine.step(data)
+            response = session.encode_observation(observation, data)
+            stats.record(time.perf_counter() - started)
+            stats.record_phases(session.engine.timings, observation)
+            session.changed.notify_all()
+        return response, 200
+    except EngineError as e:
+        return {
+            "error": e.error,
+            "details": e.details
+        }, 400
+    except Exception as e:
+        logger.exception('Tick failed in session %s', session.id)
+        stats.record_error()
+        return {
+            "error": "processing_failed",
+            "details": str(e)
+        }, 500
+
+
+def parse_batch(data):
+    """(команды, режим ответов) или (None, ответ с ошибкой)"""
+    commands = data.get('commands') if isinstance(data, dict) else None
+    mode = data.get('responses', 'last') if isinstance(data, dict) else None
+    if not isinstance(commands, list) or not commands or mode not in ('all', 'last'):
+        return None, ({
+            "error": "invalid_command",
+            "details": ['Batch requires a non-empty "commands" list and "responses" of "all" or "last"']
+        }, 400)
+    return commands, mode
+
+
+def step_batch(session, commands, mode, stats):
+    """
+    Выполняет команды пакета под блокировкой сессии.
+    Возвращает (ответы, None) или (ответы выполненных тактов, (индекс, EngineError)).
+    В режиме 'last' хранится только последний ответ.
+    """
+    responses = []
+    with session.lock:
+        # Пакет всегда возвращает полные наблюдения
+        session.delta.forget()
+        started = time.perf_counter()
+        ticks = 0
+        try:
+            for index, command_data in enumerate(commands):
+                try:
+                    response = session.engine.step(command_data)
+                except EngineError as e:
+                    return responses, (index, e)
+                ticks += 1
+                stats.record_phases(session.engine.timings, response)
+                if mode == 'all':
+                    responses.append(response)
+                else:
+                    responses = [response]
+        finally:
+            if ticks:
+                stats.record(time.perf_counter() - started, ticks)
+            session.changed.notify_all()
+    return responses, None
+
+
+def run_batch(session, commands, mode, stats):
+    """
+    Выполняет несколько тактов за один запрос.
+    При невалидной команде обработка останавливается, уже выполненные такты остаются.
+    """
+    try:
+        responses, failure = step_batch(session, commands, mode, stats)
+    except Exception as e:
+        logger.exception('Batch failed in session %s', session.id)
+        stats.record_error()
+        return {
+            "error": "processing_failed",
+            "details": str(e)
+        }, 500
+
+    if failure is not None:
+        index, error = failure
+        return {
+            "error": error.error,
+            "index": index,
+            "details": error.details,
+            "ticks": index,
+            "responses": responses
+        }, 400
+
+    if mode == 'all':
+        return {"ticks": len(commands), "responses": responses}, 200
+    return {"ticks": len(commands), "response": responses[0]}, 200
+
+
+def toggle_profiler(profiler, data):
+    """Тело: {"enabled": bool, "interval": секунды (необязательно), "reset": bool (необязательно)}"""
+    enabled = data.get('enabled') if isinstance(data, dict) else None
+    interval = data.get('interval') if isinstance(data, dict) else None
+    if not isinstance(enabled, bool) or not (interval is None or (
+            isinstance(interval, (int, float)) and 0.0005 <= interval <= 1)):
+        return {
+            'error': 'invalid_params',
+            'details': ['Profiler requires boolean "enabled" and optional "interval" between 0.0005 and 1 s']
+        }, 400
+
+    if data.get('reset'):
+        profiler.reset()
+    if enabled:
+        profiler.start(interval)
+    else:
+        profiler.stop()
+    return profiler.status(), 200
+
+
+def close_session(sessions, session_id):
+    if session_id is None or not sessions.remove(session_id):
+        return {'error': 'session_not_found'}, 404
+    return {'status': 'session_closed', 'session_id': session_id}, 200
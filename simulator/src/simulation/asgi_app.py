@@ -0,0 +1,452 @@
+"""
+ASGI-сервер симулятора: те же маршруты и ответы, что у Flask-сервера (main.py),
+но на asyncio - для тысяч одновременных keep-alive соединений ботов.
+Запуск (один процесс: сессии хранятся в памяти):
+    cd simulator/src/simulation
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+
+Блокировки:
+    - запросы к одному миру выстраиваются в очередь на asyncio.Lock сессии,
+      поэтому поток из пула занимает только тот запрос, чья очередь подошла;
+    - такт выполняется в пуле потоков под session.lock (как во Flask-сервере),
+      цикл событий не блокируется;
+    - поиск и закрытие сессий (с закрытием записей просроченных) тоже идут в пуле потоков;
+    - long-poll и /stream ждут новую версию мира на asyncio.Condition сессии
+      без потоков.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+from sessions import SessionRegistry
+from stats import TickStats
+from profiler import SamplingProfiler
+from encoding import (JSON_MIMETYPE, GRID_MIMETYPE, available_mimetypes,
+                      encode_json, encode_payload, encode_grid_state, grid_supported)
+import api
+import metrics
+
+MAX_SESSIONS = int(os.environ.get('SIMULATOR_MAX_SESSIONS', 100))
+SESSION_TTL = float(os.environ.get('SIMULATOR_SESSION_TTL', 600))
+WORKER_THREADS = int(os.environ.get('SIMULATOR_WORKER_THREADS', min(32, (os.cpu_count() or 1) + 4)))
+LONG_POLL_TIMEOUT = 60
+STREAM_HEARTBEAT = 15
+
+sessions = SessionRegistry(max_sessions=MAX_SESSIONS, idle_ttl=SESSION_TTL)
+tick_stats = TickStats()
+profiler = SamplingProfiler()
+if os.environ.get('SIMULATOR_PROFILER') == '1':
+    profiler.start()
+logger = logging.getLogger(__name__)
+executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix='tick')
+
+
+class WorldChannel:
+    """asyncio-примитивы сессии: очередь запросов к миру и оповещение о новых тактах"""
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.changed = asyncio.Condition()
+
+    async def notify(self):
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def wait_for_version(self, session, version, timeout):
+        """Ждет, пока версия мира станет больше version; False - по таймауту"""
+        async with self.changed:
+            try:
+                await asyncio.wait_for(self.changed.wait_for(
+                    lambda: session.engine.gameworld.version > version), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+
+# Каналы живут, пока жива сессия
+channels = weakref.WeakKeyDictionary()
+
+
+def channel(session):
+    if session not in channels:
+        channels[session] = WorldChannel()
+    return channels[session]
+
+
+async def run_sync(func, *args):
+    """Выполняет блокирующий вызов в пуле потоков"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args))
+
+
+async def run_in_world(session, func, *args):
+    """Вызов, изменяющий мир: по очереди для сессии, затем оповещение ожидающих"""
+    world = channel(session)
+    async with world.lock:
+        result = await run_sync(func, *args)
+    await world.notify()
+    return result
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = {key: values[-1] for key, values in
+                     parse_qs(scope['query_string'].decode('latin-1')).items()}
+        self.headers = {key.decode('latin-1').lower(): value.decode('latin-1')
+                        for key, value in scope['headers']}
+        self.body = body
+
+    def get_json(self):
+        """Тело запроса как JSON; ValueError, если это не JSON"""
+        return json.loads(self.body) if self.body else None
+
+    def session_id(self, data=None):
+        """session_id из query-параметра, заголовка X-Session-Id или тела запроса"""
+        session_id = self.args.get('session_id') or self.headers.get('x-session-id')
+        if session_id is None and isinstance(data, dict):
+            session_id = data.get('session_id')
+        return session_id
+
+    def arg(self, name, type, default=None):
+        try:
+            return type(self.args[name])
+        except (KeyError, ValueError):
+            return default
+
+    def negotiate_format(self, grid=False):
+        """Формат ответа по заголовку Accept; None - ни один формат не подходит"""
+        accept = self.headers.get('accept')
+        if not accept:
+            return JSON_MIMETYPE
+        return parse_accept_header(accept, MIMEAccept).best_match(available_mimetypes(grid))
+
+
+class Response:
+    def __init__(self, body, status=200, mimetype=JSON_MIMETYPE, headers=None):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.headers = headers or {}
+
+    async def send(self, send):
+        headers = [(b'content-type', self.mimetype.encode()),
+                   (b'content-length', str(len(self.body or b'')).encode())]
+        headers += [(key.encode(), value.encode()) for key, value in self.headers.items()]
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': self.body or b''})
+
+
+def reply(result, mimetype=JSON_MIMETYPE, stats=None):
+    """Ответ обработчика api: (payload, status); со stats учитываются время кодирования и размер"""
+    payload, status = result
+    if status != 200:
+        return Response(encode_json(payload), status)
+    started = time.perf_counter()
+    body = encode_payload(payload, mimetype)
+    if stats is not None:
+        stats.record_payload(time.perf_counter() - started, len(body))
+    return Response(body, mimetype=mimetype)
+
+
+async def find_session(request, data=None, missing=api.GAME_NOT_FOUND):
+    """
+    (сессия, None) или (None, ответ с ошибкой).
+    Поиск в пуле потоков: реестр под блокировкой закрывает просроченные сессии (и их записи).
+    """
+    session_id = request.session_id(data)
+    session = await run_sync(sessions.get, session_id)
+    if session is None:
+        return None, reply(api.session_required(sessions, session_id) or (missing, 404))
+    return session, None
+
+
+def not_acceptable(grid=False):
+    return reply(api.not_acceptable(available_mimetypes(grid)))
+
+
+async def init_game(request, data):
+    return reply(await run_sync(api.init_game, sessions, data))
+
+
+async def status_check(request, data):
+    return reply(await run_sync(api.status, sessions, request.session_id()))
+
+
+def state_body(session, mimetype, etags):
+    """(версия, тело) полного состояния; тело None, если у клиента актуальная версия"""
+    with session.lock:
+        version = session.engine.gameworld.version
+        if etags.contains(api.state_etag(session, version, mimetype)):
+            return version, None
+        if mimetype == GRID_MIMETYPE:
+            return version, session.snapshot(mimetype, lambda: encode_grid_state(session.engine.gameworld))
+        return version, session.snapshot(mimetype, lambda: encode_payload(
+            session.engine.full_state(), mimetype))
+
+
+async def get_full_state(request, data):
+    session, error = await find_session(request)
+    if error:
+        return error
+
+    grid = grid_supported(session.engine.gameworld)
+    mimetype = request.negotiate_format(grid)
+    if mimetype is None:
+        return not_acceptable(grid)
+
+    # Long-poll: ?wait_version=N - ответить, когда версия состояния станет больше N
+    wait_version = request.arg('wait_version', int)
+    timeout = min(request.arg('timeout', float, 30), LONG_POLL_TIMEOUT)
+
+    try:
+        if wait_version is not None:
+            await channel(session).wait_for_version(session, wait_version, timeout)
+        etags = parse_etags(request.headers.get('if-none-match'))
+        version, body = await run_sync(state_body, session, mimetype, etags)
+    except Exception:
+        logger.exception('Full state retrieval failed in session %s', session.id)
+        return reply(({'error': 'state_retrieval_failed'}, 500))
+
+    headers = {
+        'ETag': quote_etag(api.state_etag(session, version, mimetype)),
+        'Vary': api.ETAG_VARY,
+        'X-State-Version': str(version)
+    }
+    return Response(body, status=304 if body is None else 200, mimetype=mimetype, headers=headers)
+
+
+async def get_static_map(request, data):
+    """Препятствия мира - для предварительных расчетов на стороне бота"""
+    session, error = await find_session(request)
+    if error:
+        return error
+
+    mimetype = request.negotiate_format()
+    if mimetype is None:
+        return not_acceptable()
+
+    etag = api.static_map_etag(session, mimetype)
+    if parse_etags(request.headers.get('if-none-match')).contains(etag):
+        response = Response(None, status=304, mimetype=mimetype)
+    else:
+        response = reply(await run_sync(api.static_map, session), mimetype)
+    response.headers['ETag'] = quote_etag(etag)
+    response.headers['Vary'] = api.ETAG_VARY
+    return response
+
+
+def sse_event(data, event, event_id):
+    lines = [f'id: {event_id}', f'event: {event}']
+    lines += [f'data: {line}' for line in data.splitlines()]
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventStream:
+    """Ответ text/event-stream: события отправляются по мере готовности"""
+    def __init__(self, session):
+        self.session = session
+
+    async def send(self, send, receive):
+        session = self.session
+        world = channel(session)
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+
+        async def emit(text):
+            await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+
+        try:
+            sent_version = None
+            while sessions.is_active(session) and not disconnected.is_set():
+                if sent_version is not None and not await world.wait_for_version(
+                        session, sent_version, STREAM_HEARTBEAT):
+                    # Комментарий SSE поддерживает соединение
+                    await emit(': heartbeat\n\n')
+                    continue
+                version, body = await run_sync(state_body, session, JSON_MIMETYPE, parse_etags(None))
+                session.touch()
+                skipped = 0 if sent_version is None else version - sent_version - 1
+                if skipped:
+                    await emit(sse_event(str(skipped), 'skipped', version))
+                await emit(sse_event(body.decode(), 'state', version))
+                sent_version = version
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            watcher.cancel()
+
+
+async def stream_state(request, data):
+    """
+    Server-Sent Events: полное состояние (как /full-state в JSON) после каждого такта.
+    Промежуточные такты, которые клиент не успел принять, пропускаются (событие skipped).
+    """
+    session, error = await find_session(request)
+    if error:
+        return error
+    return EventStream(session)
+
+
+async def handle_command(request, data):
+    session, error = await find_session(request, data, api.GAME_NOT_INITIALIZED)
+    if error:
+        return error
+
+    mimetype = request.negotiate_format()
+    if mimetype is None:
+        return not_acceptable()
+
+    return reply(await run_in_world(session, api.run_command, session, data, tick_stats), mimetype, tick_stats)
+
+
+async def handle_command_batch(request, data):
+    session, error = await find_session(request, data, api.GAME_NOT_INITIALIZED)
+    if error:
+        return error
+
+    commands, mode = api.parse_batch(data)
+    if commands is None:
+        return reply(mode)
+
+    mimetype = request.negotiate_format()
+    if mimetype is None:
+        return not_acceptable()
+
+    return reply(await run_in_world(session, api.run_batch, session, commands, mode, tick_stats),
+                 mimetype, tick_stats)
+
+
+async def close_session(request, data):
+    # Закрытие ждет такт сессии и дописывает ее запись - вне цикла событий
+    return reply(await run_sync(api.close_session, sessions, request.session_id()))
+
+
+async def fork_session(request, data):
+    session, error = await find_session(request, data, api.GAME_NOT_INITIALIZED)
+    if error:
+        return error
+    return reply(await run_in_world(session, api.fork_session, sessions, session, data))
+
+
+async def save_checkpoint(request, data):
+    session, error = await find_session(request, data, api.GAME_NOT_INITIALIZED)
+    if error:
+        return error
+    return reply(await run_in_world(session, api.save_checkpoint, session))
+
+
+async def server_stats(request, data):
+    """Пропускная способность и задержки тактов сервера"""
+    return reply((dict(tick_stats.summary(), sessions=len(sessions)), 200))
+
+
+async def server_metrics(request, data):
+    """Метрики в формате Prometheus"""
+    body = metrics.render(tick_stats, sessions, profiler).encode()
+    return Response(body, mimetype=metrics.PROMETHEUS_MIMETYPE)
+
+
+async def profiler_stacks(request, data):
+    """Накопленные стеки профилировщика в свернутом формате (?limit=N)"""
+    return Response(profiler.folded(request.arg('limit', int)).encode(), mimetype='text/plain')
+
+
+async def toggle_profiler(request, data):
+    # Остановка ждет завершения потока профилировщика - вне цикла событий
+    return reply(await run_sync(api.toggle_profiler, profiler, data))
+
+
+ROUTES = {
+    '/init': {'POST': init_game},
+    '/status': {'GET': status_check},
+    '/full-state': {'GET': get_full_state},
+    '/static-map': {'GET': get_static_map},
+    '/stream': {'GET': stream_state},
+    '/command': {'POST': handle_command},
+    '/command/batch': {'POST': handle_command_batch},
+    '/session': {'DELETE': close_session},
+    '/session/fork': {'POST': fork_session},
+    '/session/checkpoint': {'POST': save_checkpoint},
+    '/stats': {'GET': server_stats},
+    '/metrics': {'GET': server_metrics},
+    '/profiler': {'GET': profiler_stacks, 'POST': toggle_profiler},
+}
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            profiler.stop()
+            # Закрытие сессий ждет их тактов и дописывает записи
+            await run_sync(sessions.close_all)
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    body = await read_body(receive)
+    if body is None:
+        return
+    request = Request(scope, body)
+
+    methods = ROUTES.get(request.path)
+    if methods is None:
+        response = reply(({'error': 'not_found'}, 404))
+    elif request.method not in methods:
+        response = reply(({'error': 'method_not_allowed'}, 405))
+    else:
+        try:
+            data = request.get_json() if request.method == 'POST' else None
+        except ValueError:
+            response = reply(({'error': 'invalid_json', 'details': 'Request body is not valid JSON'}, 400))
+        else:
+            response = await methods[request.method](request, data)
+
+    if isinstance(response, EventStream):
+        await response.send(send, receive)
+    else:
+        await response.send(send)
+
+
+if __name__ == '__main__':
+    import uvicorn  # необязательная зависимость: pip install uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=5000, log_level='warning')
@@ -0,0 +1,240 @@
+import numpy as np
+from game_objects import GameWorld, EMPTY, NPC, AGENT
+from game_logic import DIRECTIONS, DELTAS, visible_in_window
+from validation import validate_init_params, validate_command
+from engine import EngineError
+
+ATTACK = 0
+MOVE = 1
+
+
+class BatchEngine:
+    """
+    K независимых миров одного размера, хранящихся как сложенные массивы:
+        grid (K, N, N)       - сетка занятости (коды EMPTY/OBSTACLE/NPC/AGENT)
+        resources (K, N, N)  - карта ресурсов
+        agents (K, 2)        - позиции агентов, directions (K,) - индексы в DIRECTIONS
+        npcs (K, M, 2)       - позиции NPC, npc_alive (K, M) - живые NPC
+        npc_at (K, N, N)     - номер NPC в клетке (-1 - нет)
+        free_cells (K, N*N)  - свободные клетки каждого мира в порядке FreeCellIndex,
+                               free_slots - их позиции, free_size (K,) - число
+    step применяет по одной команде к каждому миру. Правила такта совпадают с
+    process_game_tick в режиме npc_update_mode='sequential': NPC обрабатываются
+    по порядку (векторно по мирам), каждый пробует направления в случайном
+    порядке и занимает первую пустую клетку.
+    У каждого мира свой генератор np_rng (как у GameWorld), числа из него берутся
+    в том же порядке, что и в GameWorld, поэтому мир k повторяет траекторию
+    SimulationEngine с той же конфигурацией и npc_update_mode='sequential'.
+    """
+    def __init__(self, configs):
+        if not configs:
+            raise EngineError('invalid_params', ['At least one world config is required'])
+
+        worlds = []
+        for config in configs:
+            errors, validated_config = validate_init_params(dict(config))
+            if errors:
+                raise EngineError('invalid_params', errors)
+            if validated_config['world_mode'] != 'dense':
+                raise EngineError('invalid_params', ['Batches support only dense worlds (world_mode "dense")'])
+            worlds.append(GameWorld(validated_config))
+
+        field_sizes = {world.field_size for world in worlds}
+        if len(field_sizes) != 1:
+            raise EngineError('invalid_params', ['All worlds in a batch must have the same field_size'])
+
+        self.size = len(worlds)
+        self.field_size = field_sizes.pop()
+        self.worlds = np.arange(self.size)
+        self.configs = [world.get_init_params() for world in worlds]
+
+        self.grid = np.stack([world.grid for world in worlds])
+        self.resources = np.stack([world.resource_grid for world in worlds])
+        self.agents = np.array([(world.agent.x, world.agent.y) for world in worlds], dtype=np.int32)
+        self.directions = np.zeros(self.size, dtype=np.int8)
+        self.scores = np.zeros(self.size, dtype=np.int64)
+        self.respawns = np.zeros(self.size, dtype=np.int64)
+        self.npc_movement = np.array([world.npc_movement for world in worlds])
+        self.vision_radius = np.array([world.agent_vision_radius for world in worlds])
+
+        max_npcs = max(len(world.npcs) for world in worlds)
+        self.npcs = np.zeros((self.size, max_npcs, 2), dtype=np.int32)
+        self.npc_alive = np.zeros((self.size, max_npcs), dtype=bool)
+        self.npc_at = np.full(self.grid.shape, -1, dtype=np.int16)
+        for k, world in enumerate(worlds):
+            count = len(world.npcs)
+            self.npcs[k, :count] = world.npcs
+            self.npc_alive[k, :count] = True
+            self.npc_at[k, world.npcs[:, 0], world.npcs[:, 1]] = np.arange(count)
+
+        # Генераторы миров продолжают последовательность после расстановки сущностей
+        self.rngs = [world.np_rng for world in worlds]
+        cell_count = self.field_size * self.field_size
+        cell_type = np.int16 if cell_count <= np.iinfo(np.int16).max else np.int32
+        self.free_cells = np.zeros((self.size, cell_count), dtype=cell_type)
+        self.free_slots = np.full((self.size, cell_count), -1, dtype=cell_type)
+        self.free_size = np.array([len(world.free_cells) for world in worlds], dtype=np.int64)
+        for k, world in enumerate(worlds):
+            self.free_cells[k] = world.free_cells.cells[:cell_count]
+            self.free_slots[k] = world.free_cells.slots
+
+    def _inside(self, positions):
+        return ((positions >= 0) & (positions < self.field_size)).all(axis=-1)
+
+    def _clip(self, positions):
+        return np.clip(positions, 0, self.field_size - 1)
+
+    def _free_add(self, worlds, x, y):
+        """Как FreeCellIndex.add в каждом мире из worlds (миры не повторяются)"""
+        cells = x * self.field_size + y
+        new = self.free_slots[worlds, cells] < 0
+        worlds, cells = worlds[new], cells[new]
+        self.free_cells[worlds, self.free_size[worlds]] = cells
+        self.free_slots[worlds, cells] = self.free_size[worlds]
+        self.free_size[worlds] += 1
+
+    def _free_replace(self, worlds, taken_x, taken_y, released_x, released_y):
+        """
+        Как FreeCellIndex.replace: занятая клетка уступает слот освободившейся
+        (то же, что add(released) и remove(taken) при одном ходе)
+        """
+        taken = taken_x * self.field_size + taken_y
+        released = released_x * self.field_size + released_y
+        slots = self.free_slots[worlds, taken]
+        self.free_cells[worlds, slots] = released
+        self.free_slots[worlds, released] = slots
+        self.free_slots[worlds, taken] = -1
+
+    def _place_agents(self, worlds, x, y):
+        """Как GameWorld.move_agent для агентов миров worlds"""
+        old_x, old_y = self.agents[worlds].T
+        self.grid[worlds, old_x, old_y] = EMPTY
+        self.grid[worlds, x, y] = AGENT
+        self._free_replace(worlds, x, y, old_x, old_y)
+        self.agents[worlds, 0] = x
+        self.agents[worlds, 1] = y
+
+    def step(self, commands):
+        """Применяет список из K команд в формате /command"""
+        if len(commands) != self.size:
+            raise EngineError('invalid_command', [f'Expected {self.size} commands, got {len(commands)}'])
+
+        actions = np.zeros(self.size, dtype=np.int8)
+        directions = np.zeros(self.size, dtype=np.int8)
+        for k, command_data in enumerate(commands):
+            errors = validate_command(command_data) if isinstance(command_data, dict) else ['Command must be an object']
+            if errors:
+                raise EngineError('invalid_command', [f'World {k}: {error}' for error in errors])
+            if command_data['command'] == 'move':
+                actions[k] = MOVE
+                directions[k] = DIRECTIONS.index(command_data['direction'])
+
+        self.step_arrays(actions, directions)
+
+    def step_arrays(self, actions, directions):
+        """
+        Один такт во всех мирах.
+        actions (K,) - ATTACK или MOVE, directions (K,) - индексы в DIRECTIONS (для MOVE)
+        """
+        actions = np.asarray(actions)
+        directions = np.asarray(directions)
+        self._move_agents(actions == MOVE, directions)
+        self._attack(actions == ATTACK)
+        self._move_npcs()
+
+    def _move_agents(self, move, directions):
+        worlds = self.worlds
+        self.directions[move] = directions[move]
+
+        target = self.agents + DELTAS[directions]
+        tx, ty = self._clip(target).T
+        passable = self._inside(target) & (self.grid[worlds, tx, ty] == EMPTY)
+
+        go = move & passable
+        self._place_agents(worlds[go], tx[go], ty[go])
+
+        # Сбор ресурсов
+        picked = go & self.resources[worlds, tx, ty]
+        self.resources[worlds[picked], tx[picked], ty[picked]] = False
+        self.scores[picked] += 5
+
+        # Выход за границы или непроходимая клетка - респавн со штрафом
+        collide = move & ~passable
+        self.scores[collide] -= 10
+        self.respawns[collide] += 1
+        self._respawn(worlds[collide])
+
+    def _respawn(self, worlds):
+        # Как FreeCellIndex.choice: случайный слот из генератора мира
+        worlds = worlds[self.free_size[worlds] > 0]
+        if not len(worlds):
+            return
+        slots = [int(self.rngs[k].integers(self.free_size[k])) for k in worlds.tolist()]
+        flat = self.free_cells[worlds, slots].astype(np.int64)
+        x, y = np.divmod(flat, self.field_size)
+        self._place_agents(worlds, x, y)
+
+    def _attack(self, attack):
+        worlds = self.worlds
+        for delta in DELTAS:
+            target = self.agents + delta
+            tx, ty = self._clip(target).T
+            hit = attack & self._inside(target) & (self.grid[worlds, tx, ty] == NPC)
+            w, hx, hy = worlds[hit], tx[hit], ty[hit]
+            self.npc_alive[w, self.npc_at[w, hx, hy]] = False
+            self.npc_at[w, hx, hy] = -1
+            self.grid[w, hx, hy] = EMPTY
+            self._free_add(w, hx, hy)
+            self.scores[hit] += 10
+
+    def _move_npcs(self):
+        npc_slots = self.npcs.shape[1]
+        if not npc_slots or not self.npc_movement.any():
+            return
+
+        # Порядок направлений живых NPC из генератора каждого мира (как в move_npcs_sequential)
+        orders = np.zeros((self.size, npc_slots, 4), dtype=np.intp)
+        for k in np.flatnonzero(self.npc_movement).tolist():
+            alive = np.flatnonzero(self.npc_alive[k])
+            orders[k, alive] = self.rngs[k].random((len(alive), 4)).argsort(axis=1)
+
+        # NPC с одинаковым номером обрабатываются сразу во всех мирах
+        for j in range(npc_slots):
+            w = self.worlds[self.npc_movement & self.npc_alive[:, j]]
+            if not len(w):
+                continue
+            position = self.npcs[w, j]
+            pending = np.ones(len(w), dtype=bool)
+
+            for option in range(4):
+                target = position + DELTAS[orders[w, j, option]]
+                tx, ty = self._clip(target).T
+                ok = pending & self._inside(target) & (self.grid[w, tx, ty] == EMPTY)
+                if ok.any():
+                    mw, old, new = w[ok], position[ok], target[ok]
+                    self.grid[mw, old[:, 0], old[:, 1]] = EMPTY
+                    self.npc_at[mw, old[:, 0], old[:, 1]] = -1
+                    self.grid[mw, new[:, 0], new[:, 1]] = NPC
+                    self.npc_at[mw, new[:, 0], new[:, 1]] = j
+                    self._free_replace(mw, new[:, 0], new[:, 1], old[:, 0], old[:, 1])
+                    self.npcs[mw, j] = new
+                    pending &= ~ok
+                    if not pending.any():
+                        break
+
+    def observe(self, k):
+        """Наблюдение агента мира k в формате ответа /command"""
+        x, y = self.agents[k].tolist()
+        return {
+            "width": self.field_size,
+            "height": self.field_size,
+            "score": int(self.scores[k]),
+            "respawns": int(self.respawns[k]),
+            "agent": {
+                "x": x,
+                "y": y,
+                "direction": DIRECTIONS[self.directions[k]]
+            },
+            "visible_entities": visible_in_window(self.grid[k], self.resources[k], x, y,
+                                                  int(self.vision_radius[k]))
+        }
@@ -0,0 +1,63 @@
+"""
+Сохранение мира в файл и восстановление без повторной генерации.
+
+Файл - архив NumPy (.npz, сжатый): массивы сущностей в порядке мира (checkpoint_arrays мира),
+сетка не хранится (она однозначно восстанавливается по препятствиям, NPC и агенту;
+у ChunkedWorld препятствия созданных чанков строятся заново по seed), остальное -
+JSON в поле meta: конфигурация, счет, агент, состояние генератора случайных чисел.
+Восстановление не строит шум Перлина и не расставляет сущности заново,
+поэтому быстрее создания мира, а дальнейшая траектория совпадает с исходной.
+
+    save_checkpoint(engine.gameworld, "world.npz")
+    gameworld = load_checkpoint("world.npz")
+"""
+import json
+import numpy as np
+from chunked_world import create_world
+
+CHECKPOINT_FORMAT = 'reco-checkpoint'
+CHECKPOINT_VERSION = 1
+
+
+class CheckpointError(Exception):
+    """Файл не является сохранением мира поддерживаемой версии"""
+
+
+def save_checkpoint(gameworld, path):
+    """Записывает мир в path (файловый объект или путь; к пути без .npz NumPy добавит расширение)"""
+    state = gameworld.get_state()
+    meta = {
+        'format': CHECKPOINT_FORMAT,
+        'version': CHECKPOINT_VERSION,
+        'config': gameworld.config,
+        'score': state['score'],
+        'respawns': state['respawns'],
+        'world_version': state['version'],
+        'agent': state['agent'],
+        'rng': state['rng'],
+    }
+    np.savez_compressed(
+        path,
+        meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+        **gameworld.checkpoint_arrays()
+    )
+
+
+def load_checkpoint(path):
+    """Мир (GameWorld или ChunkedWorld) из файла save_checkpoint"""
+    with np.load(path) as data:
+        try:
+            meta = json.loads(data['meta'].tobytes())
+        except (KeyError, ValueError):
+            raise CheckpointError(f'{path} is not a {CHECKPOINT_FORMAT} file')
+        if meta.get('format') != CHECKPOINT_FORMAT or meta.get('version') != CHECKPOINT_VERSION:
+            raise CheckpointError(f'Unsupported checkpoint {meta.get("format")} v{meta.get("version")}')
+        state = {
+            'score': meta['score'],
+            'respawns': meta['respawns'],
+            'version': meta['world_version'],
+            'agent': meta['agent'],
+            'rng': meta['rng'],
+        }
+        state.update((name, data[name]) for name in data.files if name != 'meta')
+    return create_world(meta['config'], state)
@@ -0,0 +1,365 @@
+"""
+Большие разреженные миры: поле делится на чанки CHUNK_SIZE × CHUNK_SIZE, которые
+создаются при первом обращении к любой их клетке (шум Перлина, NPC и ресурсы чанка).
+Память и время создания мира растут с исследованной площадью, а не с field_size^2.
+
+    gameworld = create_world(config)   # ChunkedWorld при world_mode "chunked"
+
+Отличия от GameWorld:
+- препятствия - порог шума, оцененный по выборке блоков всего поля (доля препятствий
+  приблизительная); шум поточечный ('compat' или 'hashed' вместо 'fast'), поэтому чанки
+  стыкуются без швов и не зависят от порядка создания;
+- NPC и ресурсы расставляются в каждом чанке с плотностью npc_count и resource_count
+  на поле из собственного генератора чанка: их общее число - ожидаемое, а не точное;
+- NPC ходят только в активных чанках вокруг агента (радиус зрения с запасом до границы
+  чанка), остальные стоят до возвращения агента;
+- npcs, resources, obstacles, get_full_state() и get_static_map() описывают только
+  созданные чанки.
+"""
+import copy
+import hashlib
+import math
+import struct
+import numpy as np
+from game_objects import GameWorld, Agent, EMPTY, OBSTACLE, NPC, AGENT, positions_array
+from game_logic import visible_in_window
+from perlin import perlin_noise_map
+
+CHUNK_SIZE = 64
+# Потоки случайных чисел (см. game_objects.WORLD_RNG_STREAM)
+CHUNK_RNG_STREAM = 2
+THRESHOLD_RNG_STREAM = 3
+# Выборка шума для порога препятствий: блоки в случайных местах поля
+THRESHOLD_BLOCKS = 64
+THRESHOLD_BLOCK_SIZE = 8
+# Попыток найти свободную клетку для агента случайным выбором
+PLACEMENT_ATTEMPTS = 1000
+
+
+def create_world(config, state=None):
+    """GameWorld или ChunkedWorld в зависимости от config["world_mode"]"""
+    if config.get('world_mode') == 'chunked':
+        return ChunkedWorld(config, state)
+    return GameWorld(config, state)
+
+
+class ChunkedGrid:
+    """
+    Слой мира (0 - сетка занятости, 1 - ресурсы) размера field_size × field_size поверх чанков.
+    Индексируется как массив NumPy парой координат: целыми числами или массивами
+    одинаковой формы. Срезы не поддерживаются - для областей есть ChunkedWorld.window().
+    """
+    def __init__(self, world, layer):
+        self.world = world
+        self.layer = layer
+
+    def __getitem__(self, key):
+        x, y = key
+        if isinstance(x, (int, np.integer)) and isinstance(y, (int, np.integer)):
+            return self.world.chunk(x // CHUNK_SIZE, y // CHUNK_SIZE)[self.layer][x % CHUNK_SIZE, y % CHUNK_SIZE]
+        x, y = np.broadcast_arrays(np.asarray(x), np.asarray(y))
+        result = np.empty(x.shape, dtype=np.uint8 if self.layer == 0 else bool)
+        for cx, cy, mask in self._groups(x, y):
+            result[mask] = self.world.chunk(cx, cy)[self.layer][x[mask] % CHUNK_SIZE, y[mask] % CHUNK_SIZE]
+        return result
+
+    def __setitem__(self, key, value):
+        x, y = key
+        if isinstance(x, (int, np.integer)) and isinstance(y, (int, np.integer)):
+            self.world.writable_chunk(x // CHUNK_SIZE, y // CHUNK_SIZE)[self.layer][x % CHUNK_SIZE, y % CHUNK_SIZE] = value
+            return
+        x, y = np.broadcast_arrays(np.asarray(x), np.asarray(y))
+        value = np.broadcast_to(value, x.shape)
+        for cx, cy, mask in self._groups(x, y):
+            self.world.writable_chunk(cx, cy)[self.layer][x[mask] % CHUNK_SIZE, y[mask] % CHUNK_SIZE] = value[mask]
+
+    def _groups(self, x, y):
+        """(cx, cy, маска) для каждого чанка, в который попадают координаты"""
+        keys = (x // CHUNK_SIZE) * self.world.chunks_per_side + y // CHUNK_SIZE
+        for key in np.unique(keys).tolist():
+            cx, cy = divmod(key, self.world.chunks_per_side)
+            yield cx, cy, keys == key
+
+
+class ChunkedWorld(GameWorld):
+    """
+    Мир из лениво создаваемых чанков. chunks: номер чанка (cx * chunks_per_side + cy) ->
+    (сетка занятости uint8, карта ресурсов) размера CHUNK_SIZE × CHUNK_SIZE; клетки крайних
+    чанков за границей поля помечены препятствиями. grid и resource_grid - ChunkedGrid,
+    поэтому правила такта (game_logic) работают без изменений. Копия мира (fork) делит
+    чанки с оригиналом, пока одна из сторон не изменит чанк (owned - свои чанки).
+    Создание чанка не трогает генератор мира np_rng: содержимое чанка определяется
+    seed и его номером, поэтому траектория не зависит от того, когда чанк был создан.
+    """
+    def __init__(self, config, state=None):
+        self.configure(config)
+        self.chunks_per_side = -(-self.field_size // CHUNK_SIZE)
+        self.chunks = {}
+        self.owned = set()
+        self.grid = ChunkedGrid(self, 0)
+        self.resource_grid = ChunkedGrid(self, 1)
+        self.npcs = positions_array([])
+        self.resources = positions_array([])
+        # Чанки вокруг чанка агента, в которых ходят NPC: круг видимости целиком внутри
+        self.active_radius = -(-self.agent_vision_radius // CHUNK_SIZE)
+        self.noise_mode_chunks = 'compat' if self.noise_mode == 'compat' else 'hashed'
+        self.threshold = self.estimate_threshold()
+        # Ожидаемое число свободных клеток поля -> вероятности NPC и ресурса для свободной клетки
+        free_cells = self.field_size ** 2 * (1 - self.obstacle_percent / 100)
+        self.npc_density = min(1.0, self.npc_count / max(1.0, free_cells))
+        self.resource_density = min(1.0, self.resource_count / max(1.0, free_cells - self.npc_count))
+        if state is None:
+            self.initialize_world()
+        else:
+            self.restore_state(state)
+
+    def get_init_params(self):
+        params = super().get_init_params()
+        params["world_mode"] = "chunked"
+        params["chunk_size"] = CHUNK_SIZE
+        return params
+
+    def noise(self, x0, y0, width, height):
+        coords_x = np.arange(x0, x0 + width) * self.noise_scale
+        coords_y = np.arange(y0, y0 + height) * self.noise_scale
+        return perlin_noise_map(coords_x, coords_y, self.octaves, self.seed, self.noise_mode_chunks)
+
+    def estimate_threshold(self):
+        """Порог шума, выше которого клетка - препятствие (перцентиль по выборке блоков поля)"""
+        if self.obstacle_percent == 0:
+            return math.inf
+        block = min(THRESHOLD_BLOCK_SIZE, self.field_size)
+        rng = np.random.default_rng([self.seed, THRESHOLD_RNG_STREAM])
+        corners = rng.integers(self.field_size - block + 1, size=(THRESHOLD_BLOCKS, 2)).tolist()
+        sample = np.concatenate([self.noise(x, y, block, block).ravel() for x, y in corners])
+        return np.percentile(sample, 100 - self.obstacle_percent)
+
+    # Чанки
+
+    def chunk(self, cx, cy):
+        """(сетка, ресурсы) чанка; создает его при первом обращении"""
+        key = cx * self.chunks_per_side + cy
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.generate_chunk(cx, cy)
+        return chunk
+
+    def writable_chunk(self, cx, cy):
+        """Чанк для изменения: общий с копией мира чанк сначала копируется"""
+        key = cx * self.chunks_per_side + cy
+        if key not in self.owned:
+            if key not in self.chunks:
+                return self.generate_chunk(cx, cy)
+            grid, resources = self.chunks[key]
+            self.chunks[key] = (grid.copy(), resources.copy())
+            self.owned.add(key)
+        return self.chunks[key]
+
+    def generate_chunk(self, cx, cy, populate=True):
+        """Препятствия чанка по шуму; populate - расставить NPC и ресурсы чанка"""
+        x0, y0 = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+        grid = np.where(self.noise(x0, y0, CHUNK_SIZE, CHUNK_SIZE) > self.threshold, OBSTACLE, EMPTY).astype(np.uint8)
+        grid[self.field_size - x0:, :] = OBSTACLE
+        grid[:, self.field_size - y0:] = OBSTACLE
+        resources = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=bool)
+        key = cx * self.chunks_per_side + cy
+        self.chunks[key] = (grid, resources)
+        self.owned.add(key)
+        if populate:
+            rng = np.random.default_rng([self.seed, CHUNK_RNG_STREAM, cx, cy])
+            free = np.flatnonzero(grid == EMPTY)
+            taken = rng.choice(free, rng.binomial(len(free), self.npc_density), replace=False)
+            grid.flat[taken] = NPC
+            self.npcs = np.concatenate([self.npcs, self.cell_positions(taken, x0, y0)])
+            free = np.flatnonzero(grid == EMPTY)
+            taken = rng.choice(free, rng.binomial(len(free), self.resource_density), replace=False)
+            resources.flat[taken] = True
+            self.resources = np.concatenate([self.resources, self.cell_positions(taken, x0, y0)])
+        return self.chunks[key]
+
+    @staticmethod
+    def cell_positions(cells, x0, y0):
+        """Плоские индексы клеток чанка -> мировые координаты (n, 2)"""
+        xs, ys = np.divmod(np.sort(cells), CHUNK_SIZE)
+        return positions_array(np.column_stack((xs + x0, ys + y0)))
+
+    def window(self, min_x, max_x, min_y, max_y):
+        """Копии сетки и карты ресурсов прямоугольника [min_x, max_x] × [min_y, max_y]"""
+        grid = np.empty((max_x - min_x + 1, max_y - min_y + 1), dtype=np.uint8)
+        resources = np.empty(grid.shape, dtype=bool)
+        for cx in range(min_x // CHUNK_SIZE, max_x // CHUNK_SIZE + 1):
+            for cy in range(min_y // CHUNK_SIZE, max_y // CHUNK_SIZE + 1):
+                chunk_grid, chunk_resources = self.chunk(cx, cy)
+                x0, y0 = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+                lx, hx = max(min_x, x0), min(max_x, x0 + CHUNK_SIZE - 1)
+                ly, hy = max(min_y, y0), min(max_y, y0 + CHUNK_SIZE - 1)
+                target = (slice(lx - min_x, hx - min_x + 1), slice(ly - min_y, hy - min_y + 1))
+                source = (slice(lx - x0, hx - x0 + 1), slice(ly - y0, hy - y0 + 1))
+                grid[target] = chunk_grid[source]
+                resources[target] = chunk_resources[source]
+        return grid, resources
+
+    @property
+    def obstacles(self):
+        """Препятствия созданных чанков, упорядоченные по x, затем по y"""
+        parts = [positions_array([])]
+        for key, (grid, _) in self.chunks.items():
+            cx, cy = divmod(key, self.chunks_per_side)
+            parts.append(np.argwhere(grid == OBSTACLE) + (cx * CHUNK_SIZE, cy * CHUNK_SIZE))
+        positions = np.concatenate(parts)
+        inside = (positions < self.field_size).all(axis=1)
+        positions = positions[inside]
+        return positions_array(positions[np.lexsort((positions[:, 1], positions[:, 0]))])
+
+    # Мир
+
+    def initialize_world(self):
+        self.agent = None
+        x, y = self.random_free_cell(allow_resource=False)
+        if x is not None:
+            self.agent = Agent(x, y)
+            self.grid[x, y] = AGENT
+
+    def random_free_cell(self, allow_resource=True):
+        """Случайная пустая клетка поля (создает чанк выбранной клетки); (None, None), если не нашлась"""
+        for _ in range(PLACEMENT_ATTEMPTS):
+            x, y = self.np_rng.integers(self.field_size, size=2).tolist()
+            if self.grid[x, y] == EMPTY and (allow_resource or not self.resource_grid[x, y]):
+                return x, y
+        return None, None
+
+    def active_npcs(self):
+        agent = self.agent
+        if agent is None:
+            return None
+        acx, acy = agent.x // CHUNK_SIZE, agent.y // CHUNK_SIZE
+        radius = self.active_radius
+        for cx in range(max(0, acx - radius), min(self.chunks_per_side - 1, acx + radius) + 1):
+            for cy in range(max(0, acy - radius), min(self.chunks_per_side - 1, acy + radius) + 1):
+                self.chunk(cx, cy)
+        # Попадание в квадрат активных чанков одним беззнаковым сравнением на ось
+        x0, y0 = (acx - radius) * CHUNK_SIZE, (acy - radius) * CHUNK_SIZE
+        width = (2 * radius + 1) * CHUNK_SIZE
+        inside_x = (self.npcs[:, 0] - x0).view(np.uint32) < width
+        inside_y = (self.npcs[:, 1] - y0).view(np.uint32) < width
+        return np.flatnonzero(inside_x & inside_y)
+
+    def visible_entities(self, x, y, radius):
+        min_x, max_x = max(0, x - radius), min(self.field_size - 1, x + radius)
+        min_y, max_y = max(0, y - radius), min(self.field_size - 1, y + radius)
+        grid, resources = self.window(min_x, max_x, min_y, max_y)
+        return visible_in_window(grid, resources, x, y, radius, origin=(min_x, min_y))
+
+    def dense_layers(self):
+        """Карты всего поля; несозданные чанки пустые (для полей до GRID_MAX_FIELD_SIZE)"""
+        size = self.chunks_per_side * CHUNK_SIZE
+        layers = np.zeros((3, size, size), dtype=bool)
+        for key, (grid, resources) in self.chunks.items():
+            cx, cy = divmod(key, self.chunks_per_side)
+            cells = (slice(cx * CHUNK_SIZE, (cx + 1) * CHUNK_SIZE), slice(cy * CHUNK_SIZE, (cy + 1) * CHUNK_SIZE))
+            layers[0][cells] = grid == NPC
+            layers[1][cells] = resources
+            layers[2][cells] = grid == OBSTACLE
+        return tuple(layer[:self.field_size, :self.field_size] for layer in layers)
+
+    def get_state(self):
+        """
+        Как GameWorld.get_state, но вместо свободных клеток - номера созданных чанков:
+        их препятствия восстанавливаются по seed, NPC и ресурсы - из массивов.
+        """
+        return {
+            "score": self.score,
+            "respawns": self.respawns,
+            "version": self.version,
+            "agent": None if self.agent is None else
+                {"x": self.agent.x, "y": self.agent.y, "direction": self.agent.direction},
+            "npcs": self.npcs.ravel().tolist(),
+            "resources": self.resources.ravel().tolist(),
+            "chunks": sorted(self.chunks),
+            "rng": self.np_rng.bit_generator.state
+        }
+
+    def checkpoint_arrays(self):
+        return {
+            "npcs": self.npcs,
+            "resources": self.resources,
+            "chunks": np.array(sorted(self.chunks), dtype=np.int64),
+        }
+
+    def restore_state(self, state):
+        for key in np.asarray(state["chunks"], dtype=np.int64).tolist():
+            self.generate_chunk(*divmod(key, self.chunks_per_side), populate=False)
+        self.score = state["score"]
+        self.respawns = state["respawns"]
+        self.version = state["version"]
+        self.npcs = positions_array(state["npcs"])
+        self.grid[self.npcs[:, 0], self.npcs[:, 1]] = NPC
+        self.resources = positions_array(state["resources"])
+        self.resource_grid[self.resources[:, 0], self.resources[:, 1]] = True
+        if state["agent"] is not None:
+            self.agent = Agent(state["agent"]["x"], state["agent"]["y"])
+            self.agent.direction = state["agent"]["direction"]
+            self.grid[self.agent.x, self.agent.y] = AGENT
+        self.np_rng.bit_generator.state = state["rng"]
+
+    def fork(self):
+        child = ChunkedWorld.__new__(ChunkedWorld)
+        child.__dict__.update(self.__dict__)
+        child.chunks = dict(self.chunks)
+        # Чанки теперь общие: перед изменением их копирует каждая сторона
+        child.owned = set()
+        self.owned = set()
+        child.grid = ChunkedGrid(child, 0)
+        child.resource_grid = ChunkedGrid(child, 1)
+        child.npcs = self.npcs.copy()
+        child.resources = self.resources.copy()
+        child.agent = copy.copy(self.agent)
+        child.np_rng = copy.deepcopy(self.np_rng)
+        return child
+
+    def state_hash(self):
+        digest = hashlib.blake2b(digest_size=8)
+        for key in sorted(self.chunks):
+            grid, resources = self.chunks[key]
+            digest.update(struct.pack('<q', key))
+            digest.update(grid.tobytes())
+            digest.update(np.packbits(resources).tobytes())
+        digest.update(self.npcs.tobytes())
+        direction = self.agent.direction.encode() if self.agent is not None else b''
+        digest.update(struct.pack('<qq', self.score, self.respawns) + direction)
+        return digest.hexdigest()
+
+    # Изменения без индекса свободных клеток и пространственных индексов:
+    # источник истины - чанки
+
+    def move_agent(self, x, y):
+        self.grid[self.agent.x, self.agent.y] = EMPTY
+        self.grid[x, y] = AGENT
+        self.agent.x, self.agent.y = x, y
+
+    def move_npc(self, index, x, y):
+        old_x, old_y = self.npcs[index].tolist()
+        self.grid[old_x, old_y] = EMPTY
+        self.grid[x, y] = NPC
+        self.npcs[index] = (x, y)
+
+    def move_npcs(self, indices, targets):
+        old = self.npcs[indices]
+        self.grid[old[:, 0], old[:, 1]] = EMPTY
+        self.grid[targets[:, 0], targets[:, 1]] = NPC
+        self.npcs[indices] = targets
+
+    def remove_npc(self, x, y):
+        index = np.flatnonzero((self.npcs[:, 0] == x) & (self.npcs[:, 1] == y))[0]
+        self.npcs = np.delete(self.npcs, index, axis=0)
+        self.grid[x, y] = EMPTY
+
+    def collect_resource(self, x, y):
+        index = np.flatnonzero((self.resources[:, 0] == x) & (self.resources[:, 1] == y))[0]
+        self.resources = np.delete(self.resources, index, axis=0)
+        self.resource_grid[x, y] = False
+
+    def respawn_agent(self):
+        x, y = self.random_free_cell()
+        if x is not None:
+            self.move_agent(x, y)
@@ -0,0 +1,64 @@
+ENTITY_KINDS = ("npcs", "resources", "obstacles")
+
+
+def positions_set(entities):
+    return {(entity["x"], entity["y"]) for entity in entities}
+
+
+def as_points(positions):
+    return [{"x": x, "y": y} for x, y in sorted(positions)]
+
+
+def pair_moved(disappeared, appeared):
+    """
+    Пары (откуда, куда) для NPC, исчезнувших из клетки и появившихся в соседней.
+    У NPC нет идентификаторов, поэтому пара - лишь компактная запись
+    "исчез здесь + появился там"; восстановленное состояние от этого не зависит.
+    """
+    moved = []
+    for x, y in sorted(disappeared):
+        for target in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+            if target in appeared:
+                appeared.discard(target)
+                moved.append((x, y, target))
+                break
+    for x, y, _ in moved:
+        disappeared.discard((x, y))
+    return [{"from": {"x": x, "y": y}, "to": {"x": tx, "y": ty}} for x, y, (tx, ty) in moved]
+
+
+class DeltaTracker:
+    """
+    Помнит, какие видимые сущности уже отправлены клиенту, и превращает
+    полное наблюдение в разностное: появившиеся, исчезнувшие и переместившиеся
+    сущности плюс номер последовательности seq.
+    """
+    def __init__(self):
+        self.seq = 0
+        self.known = None
+
+    def forget(self):
+        """Клиент получил полное наблюдение - следующая разность будет полной синхронизацией"""
+        self.known = None
+
+    def encode(self, observation, resync=False):
+        visible = {kind: positions_set(observation["visible_entities"][kind]) for kind in ENTITY_KINDS}
+        resync = resync or self.known is None
+        known = {kind: set() for kind in ENTITY_KINDS} if resync else self.known
+        
+        appeared = {kind: visible[kind] - known[kind] for kind in ENTITY_KINDS}
+        disappeared = {kind: known[kind] - visible[kind] for kind in ENTITY_KINDS}
+        moved = pair_moved(disappeared["npcs"], appeared["npcs"])
+        
+        self.known = visible
+        self.seq += 1
+        
+        response = {key: value for key, value in observation.items() if key != "visible_entities"}
+        response["seq"] = self.seq
+        response["delta"] = {
+            "resync": resync,
+            "appeared": {kind: as_points(appeared[kind]) for kind in ENTITY_KINDS},
+            "disappeared": {kind: as_points(disappeared[kind]) for kind in ENTITY_KINDS},
+            "moved": {"npcs": moved}
+        }
+        return response
@@ -0,0 +1,80 @@
+import json
+import struct
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # msgpack - необязательная зависимость
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+GRID_MIMETYPE = 'application/x-reco-grid'
+
+# Формат application/x-reco-grid (полное состояние):
+#   заголовок GRID_HEADER, затем три слоя np.packbits по width * height бит
+#   в порядке npcs, resources, obstacles; бит клетки (x, y) имеет номер x * height + y.
+GRID_MAGIC = b'RECO'
+GRID_VERSION = 1
+GRID_HEADER = struct.Struct('<4sBHHqqhhB')
+GRID_LAYERS = ('npcs', 'resources', 'obstacles')
+# Битовые карты кодируют все поле, включая несозданные чанки: на больших полях
+# формат не предлагается (406 или другой формат из Accept)
+GRID_MAX_FIELD_SIZE = 1000
+DIRECTION_CODES = {'up': 0, 'down': 1, 'left': 2, 'right': 3}
+
+
+def grid_supported(gameworld):
+    """Доступен ли application/x-reco-grid для мира"""
+    return gameworld.field_size <= GRID_MAX_FIELD_SIZE
+
+
+def available_mimetypes(grid=False):
+    mimetypes = [JSON_MIMETYPE]
+    if msgpack is not None:
+        mimetypes.append(MSGPACK_MIMETYPE)
+    if grid:
+        mimetypes.append(GRID_MIMETYPE)
+    return mimetypes
+
+
+def is_points(value):
+    return (isinstance(value, list) and bool(value) and
+            all(isinstance(item, dict) and item.keys() == {'x', 'y'} for item in value))
+
+
+def flatten_points(payload):
+    """Списки точек [{"x": 1, "y": 2}, ...] -> плоские массивы [1, 2, ...] на любом уровне вложенности"""
+    if isinstance(payload, dict):
+        return {key: flatten_points(value) for key, value in payload.items()}
+    if is_points(payload):
+        return [coordinate for point in payload for coordinate in (point['x'], point['y'])]
+    if isinstance(payload, list):
+        return [flatten_points(item) for item in payload]
+    return payload
+
+
+def encode_msgpack(payload):
+    return msgpack.packb(flatten_points(payload), use_bin_type=True)
+
+
+def encode_json(payload):
+    """JSON в том же виде, что и jsonify Flask вне режима отладки"""
+    return json.dumps(payload, separators=(',', ':'), sort_keys=True).encode() + b'\n'
+
+
+def encode_payload(payload, mimetype):
+    if mimetype == MSGPACK_MIMETYPE:
+        return encode_msgpack(payload)
+    return encode_json(payload)
+
+
+def encode_grid_state(gameworld):
+    """Полное состояние мира в бинарном формате application/x-reco-grid"""
+    agent = gameworld.agent
+    header = GRID_HEADER.pack(
+        GRID_MAGIC, GRID_VERSION, gameworld.field_size, gameworld.field_size,
+        gameworld.score, gameworld.respawns, agent.x, agent.y,
+        DIRECTION_CODES[agent.direction]
+    )
+    return header + b''.join(np.packbits(layer, axis=None).tobytes() for layer in gameworld.dense_layers())
@@ -0,0 +1,150 @@
+import time
+from chunked_world import create_world
+from game_logic import process_game_tick, build_observation
+from validation import validate_init_params, validate_command
+from recording import TraceWriter
+from checkpoint import save_checkpoint, load_checkpoint
+
+
+class EngineError(Exception):
+    """Ошибка движка с кодом ошибки API и списком деталей"""
+    def __init__(self, error, details):
+        super().__init__(error)
+        self.error = error
+        self.details = details
+
+
+class SimulationEngine:
+    """
+    Встраиваемый движок симуляции без HTTP:
+        engine = SimulationEngine()
+        observation = engine.reset(config)
+        observation = engine.step({"command": "move", "direction": "left"})
+    Наблюдения совпадают с ответами /command.
+    После step() в timings - длительности фаз такта в секундах
+    (validation, agent, npc, visibility).
+    start_trace() включает запись тактов для воспроизведения (recording.py, replay.py).
+    save()/load() сохраняют мир в файл и восстанавливают его (checkpoint.py),
+    fork() создает независимые копии мира с текущего такта.
+    """
+    def __init__(self):
+        self.gameworld = None
+        self.timings = {}
+        self.trace = None
+        # Мир восстановлен (restore, load, fork), а не создан по конфигурации:
+        # запись должна начинаться со снимка
+        self.restored = False
+
+    @property
+    def initialized(self):
+        return self.gameworld is not None
+
+    def _require_world(self):
+        if self.gameworld is None:
+            raise EngineError('game_not_initialized', ['Call reset(config) first'])
+
+    def reset(self, config):
+        """Создает новый мир по конфигурации (формат тела /init)"""
+        if not config:
+            raise EngineError('invalid_params', 'No configuration provided')
+        if not isinstance(config, dict):
+            raise EngineError('invalid_params', ['Configuration must be an object'])
+        
+        errors, validated_config = validate_init_params(dict(config))
+        if errors:
+            raise EngineError('invalid_params', errors)
+        
+        self.stop_trace()
+        self.gameworld = create_world(validated_config)
+        self.restored = False
+        return self.observe()
+
+    def restore(self, config, state):
+        """Мир из снимка get_state() мира с конфигурацией, с которой он был создан"""
+        if not isinstance(config, dict):
+            raise EngineError('invalid_params', ['Configuration must be an object'])
+        errors, validated_config = validate_init_params(dict(config))
+        if errors:
+            raise EngineError('invalid_params', errors)
+        
+        self.stop_trace()
+        self.gameworld = create_world(validated_config, state)
+        self.restored = True
+        return self.observe()
+
+    def save(self, path):
+        """Сохраняет мир в файл (формат checkpoint.py)"""
+        self._require_world()
+        save_checkpoint(self.gameworld, path)
+
+    def load(self, path):
+        """Мир из файла save(); дальнейшая траектория совпадает с исходной"""
+        gameworld = load_checkpoint(path)
+        errors, _ = validate_init_params(dict(gameworld.config))
+        if errors:
+            raise EngineError('invalid_params', errors)
+        
+        self.stop_trace()
+        self.gameworld = gameworld
+        self.restored = True
+        return self.observe()
+
+    def fork(self, count=1):
+        """count движков с копиями текущего мира (без записи тактов)"""
+        self._require_world()
+        children = []
+        for _ in range(count):
+            child = SimulationEngine()
+            child.gameworld = self.gameworld.fork()
+            child.restored = True
+            children.append(child)
+        return children
+
+    def start_trace(self, path, snapshot_interval=1000):
+        """
+        Записывает такты мира в path; вызывается сразу после reset(), restore() или load()
+        (восстановленный мир записывается снимком такта 0)
+        """
+        self._require_world()
+        self.stop_trace()
+        state = self.gameworld.get_state() if self.restored else None
+        self.trace = TraceWriter(path, self.gameworld.config, snapshot_interval, state)
+
+    def stop_trace(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    def step(self, command_data):
+        """Выполняет один игровой такт и возвращает наблюдение"""
+        self._require_world()
+        started = time.perf_counter()
+        if not isinstance(command_data, dict):
+            raise EngineError('invalid_command', ['Command must be an object'])
+        
+        errors = validate_command(command_data)
+        if errors:
+            raise EngineError('invalid_command', errors)
+        
+        self.timings['validation'] = time.perf_counter() - started
+        observation = process_game_tick(self.gameworld, command_data, self.timings)
+        if self.trace is not None:
+            self.trace.record(self.gameworld, command_data)
+        return observation
+
+    def observe(self):
+        """Текущее наблюдение агента без выполнения такта"""
+        self._require_world()
+        return build_observation(self.gameworld)
+
+    def full_state(self):
+        self._require_world()
+        return self.gameworld.get_full_state()
+
+    def static_map(self):
+        self._require_world()
+        return self.gameworld.get_static_map()
+
+    def init_params(self):
+        self._require_world()
+        return self.gameworld.get_init_params()
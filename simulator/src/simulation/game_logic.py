@@ -1,4 +1,10 @@
-import random
+import time
+import numpy as np
+from game_objects import EMPTY, NPC, OBSTACLE
+
+DIRECTIONS = ('up', 'down', 'left', 'right')
+# Смещения в порядке DIRECTIONS (как в calculate_new_position)
+DELTAS = np.array([(0, -1), (0, 1), (-1, 0), (1, 0)], dtype=np.int32)
 
 def calculate_new_position(x, y, direction):
     if direction == 'up': return (x, y - 1)
@@ -7,7 +13,12 @@ def calculate_new_position(x, y, direction):
     if direction == 'right': return (x + 1, y)
     return (x, y)
 
-def process_game_tick(gameworld, command_data):
+def process_game_tick(gameworld, command_data, timings=None):
+    """
+    Такт: команда агента, движение NPC, наблюдение.
+    timings (если передан) заполняется длительностями фаз в секундах: agent, npc, visibility.
+    """
+    started = time.perf_counter()
     command = command_data['command']
     agent = gameworld.agent
     
@@ -22,21 +33,15 @@ def process_game_tick(gameworld, command_data):
         if not (0 <= new_x < gameworld.field_size and 0 <= new_y < gameworld.field_size):
             gameworld.handle_collision()
         else:
-            new_cell = gameworld.cells[new_x][new_y]
-            
             # Проверка на проходимость клетки
-            if new_cell.is_passable():
+            if gameworld.is_passable(new_x, new_y):
                 # Перемещаем агента
-                old_cell = gameworld.cells[agent.x][agent.y]
-                old_cell.remove_entity()
-                new_cell.add_entity(agent)
-                agent.x, agent.y = new_x, new_y
+                gameworld.move_agent(new_x, new_y)
                 
                 # Сбор ресурса если он есть
-                if new_cell.resource:
+                if gameworld.resource_grid[new_x, new_y]:
                     gameworld.score += 5
-                    gameworld.resources.remove(new_cell.resource)
-                    new_cell.remove_resource()
+                    gameworld.collect_resource(new_x, new_y)
             else:
                 # Столкновение с непроходимым объектом
                 gameworld.handle_collision()
@@ -58,46 +63,96 @@ def process_game_tick(gameworld, command_data):
             if not (0 <= x < gameworld.field_size and 0 <= y < gameworld.field_size):
                 continue
                 
-            cell = gameworld.cells[x][y]
-            
             # Если в клетке NPC - уничтожаем его
-            if cell.entity and cell.entity.kind == 'npc':
-                gameworld.npcs.remove(cell.entity)
-                cell.remove_entity()
+            if gameworld.grid[x, y] == NPC:
+                gameworld.remove_npc(x, y)
                 killed += 1
         
         # Начисляем очки: 10 за каждого убитого NPC
         gameworld.score += killed * 10
     
+    agent_done = time.perf_counter()
+    
     # Движение NPC (если включено)
     if gameworld.npc_movement:
-        # Создаем копию списка для безопасного удаления
-        for npc in gameworld.npcs[:]:
-            directions = ['up', 'down', 'left', 'right']
-            random.shuffle(directions)
-            moved = False
+        if gameworld.npc_update_mode == 'sequential':
+            move_npcs_sequential(gameworld)
+        else:
+            move_npcs_vectorized(gameworld)
+    
+    gameworld.version += 1
+    npc_done = time.perf_counter()
+    
+    # Расчет видимой области и формирование ответа
+    observation = build_observation(gameworld)
+    if timings is not None:
+        timings['agent'] = agent_done - started
+        timings['npc'] = npc_done - agent_done
+        timings['visibility'] = time.perf_counter() - npc_done
+    return observation
+
+def move_npcs_sequential(gameworld):
+    """
+    NPC ходят по очереди: каждый перебирает направления в случайном порядке
+    и занимает первую пустую клетку, в том числе освобожденную предыдущими NPC.
+    """
+    active = gameworld.active_npcs()
+    indices = range(len(gameworld.npcs)) if active is None else active.tolist()
+    # Порядок направлений для всех NPC сразу (как в move_npcs_vectorized)
+    orders = gameworld.np_rng.random((len(indices), 4)).argsort(axis=1).tolist()
+    # NPC не уничтожаются во время своей фазы, поэтому индексы стабильны
+    for index, order in zip(indices, orders):
+        npc_x, npc_y = gameworld.npcs[index].tolist()
+        
+        for d in (DIRECTIONS[k] for k in order):
+            new_x, new_y = calculate_new_position(npc_x, npc_y, d)
             
-            for d in directions:
-                new_x, new_y = calculate_new_position(npc.x, npc.y, d)
+            if (0 <= new_x < gameworld.field_size and 
+                0 <= new_y < gameworld.field_size):
                 
-                if (0 <= new_x < gameworld.field_size and 
-                    0 <= new_y < gameworld.field_size):
-                    
-                    new_cell = gameworld.cells[new_x][new_y]
-                    
-                    if new_cell.is_passable() and not new_cell.entity:
-                        # Перемещаем NPC
-                        old_cell = gameworld.cells[npc.x][npc.y]
-                        old_cell.remove_entity()
-                        new_cell.add_entity(npc)
-                        npc.x, npc.y = new_x, new_y
-                        moved = True
-                        break
+                # NPC занимает только пустую клетку (ресурс не мешает)
+                if gameworld.grid[new_x, new_y] == EMPTY:
+                    gameworld.move_npc(index, new_x, new_y)
+                    break
+
+def move_npcs_vectorized(gameworld):
+    """
+    Все NPC ходят одновременно по снимку сетки на начало фазы: каждый выбирает
+    первое в случайном порядке направление на клетку, пустую в снимке.
+    Если несколько NPC выбрали одну клетку, ее занимает NPC с меньшим индексом,
+    остальные остаются на месте. Клетки, освобожденные в этом такте, заняты быть не могут.
+    Правила те же, что в move_npcs_sequential (шаг на 1 клетку, только на пустую,
+    иначе остаться), отличается только разрешение конфликтов внутри такта.
+    """
+    active = gameworld.active_npcs()
+    npcs = gameworld.npcs if active is None else gameworld.npcs[active]
+    if not len(npcs):
+        return
+    
+    # Случайный порядок направлений для каждого NPC -> кандидаты (n, 4, 2)
+    orders = gameworld.np_rng.random((len(npcs), 4)).argsort(axis=1)
+    targets = npcs[:, None, :] + DELTAS[orders]
+    inside = ((targets >= 0) & (targets < gameworld.field_size)).all(axis=2)
+    clipped = np.clip(targets, 0, gameworld.field_size - 1)
+    free = inside & (gameworld.grid[clipped[..., 0], clipped[..., 1]] == EMPTY)
+    
+    # Первое подходящее направление; NPC без свободных соседей стоят
+    can_move = free.any(axis=1)
+    movers = np.flatnonzero(can_move)
+    chosen = targets[movers, free[movers].argmax(axis=1)]
     
-    # Расчет видимой области
+    # Конфликты: np.unique возвращает первое вхождение, то есть NPC с меньшим индексом
+    cells = chosen[:, 0] * gameworld.field_size + chosen[:, 1]
+    _, winners = np.unique(cells, return_index=True)
+    if active is not None:
+        movers = active[movers]
+    gameworld.move_npcs(movers[winners], chosen[winners])
+
+def build_observation(gameworld):
+    """Наблюдение агента: состояние агента и сущности в радиусе видимости"""
+    agent = gameworld.agent
     visible_entities = calculate_visible_entities(gameworld)
     
-    # Формируем ответ
     return {
         "width": gameworld.field_size,
         "height": gameworld.field_size,
@@ -112,32 +167,39 @@ def process_game_tick(gameworld, command_data):
     }
 
 def calculate_visible_entities(gameworld):
+    """Сущности в круге радиуса agent_vision_radius вокруг агента"""
     agent = gameworld.agent
-    radius = gameworld.agent_vision_radius
-    min_x = max(0, agent.x - radius)
-    max_x = min(gameworld.field_size - 1, agent.x + radius)
-    min_y = max(0, agent.y - radius)
-    max_y = min(gameworld.field_size - 1, agent.y + radius)
+    return gameworld.visible_entities(agent.x, agent.y, gameworld.agent_vision_radius)
+
+def visible_in_window(grid, resource_grid, x, y, radius, origin=(0, 0)):
+    """
+    Сущности в круге радиуса radius вокруг (x, y) по сетке занятости и карте ресурсов.
+    origin - мировые координаты клетки grid[0, 0], если сетка - часть мира;
+    x, y и результат - в мировых координатах.
+    """
+    origin_x, origin_y = origin
+    x, y = x - origin_x, y - origin_y
+    min_x = max(0, x - radius)
+    max_x = min(grid.shape[0] - 1, x + radius)
+    min_y = max(0, y - radius)
+    max_y = min(grid.shape[1] - 1, y + radius)
+    
+    # Круговая маска внутри ограничивающего квадрата
+    dx = np.arange(min_x, max_x + 1)[:, None] - x
+    dy = np.arange(min_y, max_y + 1)[None, :] - y
+    in_circle = dx * dx + dy * dy <= radius * radius
     
-    visible = {
-        "npcs": [],
-        "resources": [],
-        "obstacles": []
+    layers = {
+        "npcs": grid[min_x:max_x + 1, min_y:max_y + 1] == NPC,
+        "resources": resource_grid[min_x:max_x + 1, min_y:max_y + 1],
+        "obstacles": grid[min_x:max_x + 1, min_y:max_y + 1] == OBSTACLE
     }
     
-    for x in range(min_x, max_x + 1):
-        for y in range(min_y, max_y + 1):
-            cell = gameworld.cells[x][y]
-            
-            # Проверяем сущности
-            if cell.entity:
-                if cell.entity.kind == "npc":
-                    visible["npcs"].append({"x": x, "y": y})
-                elif cell.entity.kind == "obstacle":
-                    visible["obstacles"].append({"x": x, "y": y})
-            
-            # Проверяем ресурсы
-            if cell.resource:
-                visible["resources"].append({"x": x, "y": y})
+    # np.nonzero обходит окно построчно: по x, затем по y
+    visible = {}
+    for key, layer in layers.items():
+        xs, ys = np.nonzero(layer & in_circle)
+        visible[key] = [{"x": i + min_x + origin_x, "y": j + min_y + origin_y}
+                        for i, j in zip(xs.tolist(), ys.tolist())]
     
-    return visible
\ No newline at end of file
+    return visible
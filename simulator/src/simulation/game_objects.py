@@ -1,68 +1,146 @@
+import copy
+import hashlib
+import struct
 import numpy as np
-from perlin_noise import PerlinNoise
-import random
+from perlin import perlin_noise_map
+from spatial_index import RowIndex
 
-class Obstacle:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.kind = "obstacle"
-        self.is_passable = False
+# Коды содержимого клетки в сетке занятости
+EMPTY = 0
+OBSTACLE = 1
+NPC = 2
+AGENT = 3
 
-class Npc:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.kind = "npc"
-        self.is_passable = False
+# Номер потока случайных чисел мира: генератор мира не совпадает с генератором
+# градиентов шума (perlin.fast_gradients), посеянным тем же seed
+WORLD_RNG_STREAM = 1
 
-class Resource:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.kind = "resource"
-        self.is_passable = True
 
-class Agent:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.direction = 'up'
-        self.kind = "agent"
-        self.is_passable = False
+def world_rng(seed):
+    """Собственный генератор мира, полностью определяемый seed"""
+    return np.random.default_rng([seed, WORLD_RNG_STREAM])
 
-class Cell:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.entity = None
-        self.resource = None
 
-    def add_entity(self, entity):
-        self.entity = entity
+def positions_array(positions):
+    """Список координат -> массив формы (n, 2)"""
+    return np.array(positions, dtype=np.int32).reshape(-1, 2)
 
-    def remove_entity(self):
-        self.entity = None
 
-    def add_resource(self, resource):
-        self.resource = resource
+class FreeCellIndex:
+    """
+    Множество свободных клеток (плоский индекс x * field_size + y).
+    Клетки лежат в плотном массиве cells[:size], slots хранит позицию клетки в нем
+    (-1 - клетка занята). Добавление, удаление и случайный выбор - O(1).
+    Случайный выбор использует переданный генератор мира.
+    """
+    def __init__(self, field_size):
+        self.field_size = field_size
+        self.cells = np.empty(field_size * field_size, dtype=np.int32)
+        self.slots = np.full(field_size * field_size, -1, dtype=np.int32)
+        self.size = 0
 
-    def remove_resource(self):
-        self.resource = None
+    def __len__(self):
+        return self.size
 
-    def is_passable(self):
-        return self.entity is None or self.entity.is_passable
+    def copy(self):
+        clone = FreeCellIndex.__new__(FreeCellIndex)
+        clone.field_size = self.field_size
+        clone.cells = self.cells.copy()
+        clone.slots = self.slots.copy()
+        clone.size = self.size
+        return clone
 
-    def get_state(self):
-        state = {"x": self.x, "y": self.y}
-        if self.entity:
-            state["entity"] = self.entity.kind
-        if self.resource:
-            state["resource"] = True
-        return state
+    def load(self, cells):
+        """Восстанавливает индекс по списку клеток в порядке слотов (cells[:size])"""
+        cells = np.asarray(cells, dtype=np.int32)
+        self.size = len(cells)
+        self.cells[:self.size] = cells
+        self.slots[:] = -1
+        self.slots[cells] = np.arange(self.size, dtype=np.int32)
+
+    def fill(self, free_mask):
+        """Заполняет индекс по булевой маске свободных клеток"""
+        free = np.flatnonzero(free_mask.ravel()).astype(np.int32)
+        self.size = len(free)
+        self.cells[:self.size] = free
+        self.slots[:] = -1
+        self.slots[free] = np.arange(self.size, dtype=np.int32)
+
+    def add(self, x, y):
+        cell = x * self.field_size + y
+        if self.slots[cell] >= 0:
+            return
+        self.cells[self.size] = cell
+        self.slots[cell] = self.size
+        self.size += 1
+
+    def remove(self, x, y):
+        cell = x * self.field_size + y
+        slot = self.slots[cell]
+        if slot < 0:
+            return
+        # Переносим последнюю клетку на место удаляемой
+        self.size -= 1
+        last = self.cells[self.size]
+        self.cells[slot] = last
+        self.slots[last] = slot
+        self.slots[cell] = -1
+
+    def replace(self, taken, released):
+        """
+        Массовая замена: клетки taken (n, 2) становятся занятыми, released (n, 2) - свободными.
+        Освободившаяся клетка занимает слот занятой, поэтому размер индекса не меняется.
+        """
+        taken_cells = taken[:, 0] * self.field_size + taken[:, 1]
+        released_cells = released[:, 0] * self.field_size + released[:, 1]
+        slots = self.slots[taken_cells]
+        self.cells[slots] = released_cells
+        self.slots[released_cells] = slots
+        self.slots[taken_cells] = -1
+
+    def position(self, slot):
+        return divmod(int(self.cells[slot]), self.field_size)
+
+    def choice(self, rng):
+        return self.position(int(rng.integers(self.size)))
+
+    def sample(self, rng, k):
+        """k различных свободных клеток (индекс не изменяется)"""
+        return [self.position(slot) for slot in rng.choice(self.size, k, replace=False).tolist()]
+
+
+class Agent:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.direction = 'up'
+        self.kind = "agent"
+        self.is_passable = False
 
 class GameWorld:
-    def __init__(self, config):
+    """
+    Игровой мир. Занятость клеток хранится в сетке uint8 (коды EMPTY/OBSTACLE/NPC/AGENT),
+    ресурсы - в булевой карте, координаты NPC, ресурсов и препятствий - в массивах (n, 2)
+    в порядке их появления в мире.
+    Все случайные решения (расстановка, респавн, ходы NPC) берутся из собственного
+    генератора np_rng, посеянного seed: одинаковые seed и команды дают одинаковую траекторию.
+    С state (результат get_state) мир восстанавливается из снимка вместо расстановки сущностей.
+    """
+    def __init__(self, config, state=None):
+        self.configure(config)
+        self.grid = np.zeros((self.field_size, self.field_size), dtype=np.uint8)
+        self.resource_grid = np.zeros((self.field_size, self.field_size), dtype=bool)
+        self.npcs = positions_array([])
+        self.resources = positions_array([])
+        self.obstacles = positions_array([])
+        self.free_cells = FreeCellIndex(self.field_size)
+        if state is None:
+            self.initialize_world()
+        else:
+            self.restore_state(state)
+
+    def configure(self, config):
+        """Параметры мира из проверенной конфигурации и пустое изменяемое состояние"""
         self.config = config
         self.field_size = config['field_size']
         self.seed = config['seed']
@@ -73,13 +151,14 @@ class GameWorld:
         self.agent_vision_radius = config['agent_vision_radius']
         self.octaves = 2
         self.noise_scale = 0.15
+        self.noise_mode = config.get('noise_mode', 'compat')
+        self.npc_update_mode = config.get('npc_update_mode', 'vectorized')
         self.score = 0
+        # Растет на 1 за такт (респавн происходит внутри такта): разность версий - число тактов
+        self.version = 0
         self.respawns = 0
-        self.npcs = []
-        self.resources = []
-        self.obstacles = []
         self.agent = None
-        self.initialize_world()
+        self.np_rng = world_rng(self.seed)
 
     def get_init_params(self):
         return {
@@ -93,12 +172,8 @@ class GameWorld:
         }
 
     def generate_obstacle_map(self):
-        noise = PerlinNoise(octaves=self.octaves, seed=self.seed)
-        noise_map = np.zeros((self.field_size, self.field_size))
-
-        for i in range(self.field_size):
-            for j in range(self.field_size):
-                noise_map[i][j] = noise([i * self.noise_scale, j * self.noise_scale])
+        coords = np.arange(self.field_size) * self.noise_scale
+        noise_map = perlin_noise_map(coords, coords, self.octaves, self.seed, self.noise_mode)
 
         noise_min = np.min(noise_map)
         noise_max = np.max(noise_map)
@@ -107,45 +182,187 @@ class GameWorld:
         threshold = np.percentile(normalized_map, 100 - self.obstacle_percent)
         return (normalized_map > threshold).astype(int)
 
-    def initialize_world(self):
+    def place_obstacles(self):
         obstacle_matrix = self.generate_obstacle_map()
-        self.cells = [[Cell(i, j) for j in range(self.field_size)] for i in range(self.field_size)]
-        
-        # Список всех возможных позиций
-        all_positions = [(i, j) for i in range(self.field_size) for j in range(self.field_size)]
-        random.shuffle(all_positions)
-        
+        self.obstacles = positions_array(np.argwhere(obstacle_matrix == 1))
+        self.grid[self.obstacles[:, 0], self.obstacles[:, 1]] = OBSTACLE
+
+    def build_spatial_index(self):
+        """Пространственные индексы для запросов видимости"""
+        self.spatial = {
+            "npcs": RowIndex(self.field_size, self.npcs, self.npc_row),
+            "resources": RowIndex(self.field_size, self.resources),
+            "obstacles": RowIndex(self.field_size, self.obstacles)
+        }
+
+    def npc_row(self, x):
+        """Отсортированные y клеток с NPC в строке x сетки"""
+        return (self.grid[x] == NPC).nonzero()[0].tolist()
+
+    def initialize_world(self):
         # 1. Добавляем препятствия
-        obstacle_positions = []
-        for i, j in all_positions[:]:
-            if obstacle_matrix[i][j] == 1:
-                obstacle = Obstacle(i, j)
-                self.cells[i][j].add_entity(obstacle)
-                self.obstacles.append(obstacle)
-                obstacle_positions.append((i, j))
-        all_positions = [pos for pos in all_positions if pos not in obstacle_positions]
+        self.place_obstacles()
+        self.free_cells.fill(self.grid == EMPTY)
         
         # 2. Добавляем NPC
-        npc_positions = random.sample(all_positions, min(self.npc_count, len(all_positions)))
+        npc_positions = self.free_cells.sample(self.np_rng, min(self.npc_count, len(self.free_cells)))
+        self.npcs = positions_array(npc_positions)
         for i, j in npc_positions:
-            npc = Npc(i, j)
-            self.cells[i][j].add_entity(npc)
-            self.npcs.append(npc)
-        all_positions = [pos for pos in all_positions if pos not in npc_positions]
-        
-        # 3. Добавляем ресурсы
-        resource_positions = random.sample(all_positions, min(self.resource_count, len(all_positions)))
-        for i, j in resource_positions:
-            resource = Resource(i, j)
-            self.cells[i][j].add_resource(resource)
-            self.resources.append(resource)
-        all_positions = [pos for pos in all_positions if pos not in resource_positions]
+            self.grid[i, j] = NPC
+            self.free_cells.remove(i, j)
         
-        # 4. Добавляем агента
-        if all_positions:
-            i, j = random.choice(all_positions)
+        # 3. Добавляем агента (до ресурсов, чтобы не попасть на клетку с ресурсом)
+        if len(self.free_cells):
+            i, j = self.free_cells.choice(self.np_rng)
             self.agent = Agent(i, j)
-            self.cells[i][j].add_entity(self.agent)
+            self.grid[i, j] = AGENT
+            self.free_cells.remove(i, j)
+        
+        # 4. Добавляем ресурсы на свободные клетки (ресурс не занимает клетку)
+        resource_positions = self.free_cells.sample(self.np_rng, min(self.resource_count, len(self.free_cells)))
+        self.resources = positions_array(resource_positions)
+        self.resource_grid[self.resources[:, 0], self.resources[:, 1]] = True
+        
+        self.build_spatial_index()
+
+    def get_state(self):
+        """
+        Изменяемая часть мира (JSON-совместимый словарь). Вместе с конфигурацией
+        однозначно задает дальнейшую траекторию: порядок NPC, порядок свободных клеток
+        и состояние генератора влияют на следующие случайные решения.
+        """
+        return {
+            "score": self.score,
+            "respawns": self.respawns,
+            "version": self.version,
+            "agent": None if self.agent is None else
+                {"x": self.agent.x, "y": self.agent.y, "direction": self.agent.direction},
+            "npcs": self.npcs.ravel().tolist(),
+            "resources": self.resources.ravel().tolist(),
+            "free_cells": self.free_cells.cells[:self.free_cells.size].tolist(),
+            "rng": self.np_rng.bit_generator.state
+        }
+
+    def checkpoint_arrays(self):
+        """Массивы состояния для checkpoint.py (остальное сохраняется из get_state)"""
+        return {
+            "obstacles": self.obstacles,
+            "npcs": self.npcs,
+            "resources": self.resources,
+            "free_cells": self.free_cells.cells[:self.free_cells.size],
+        }
+
+    def restore_state(self, state):
+        """Мир из снимка get_state; без state["obstacles"] препятствия заново строятся по seed"""
+        if state.get("obstacles") is None:
+            self.place_obstacles()
+        else:
+            self.obstacles = positions_array(state["obstacles"])
+            self.grid[self.obstacles[:, 0], self.obstacles[:, 1]] = OBSTACLE
+        self.score = state["score"]
+        self.respawns = state["respawns"]
+        self.version = state["version"]
+        self.npcs = positions_array(state["npcs"])
+        self.grid[self.npcs[:, 0], self.npcs[:, 1]] = NPC
+        if state["agent"] is not None:
+            self.agent = Agent(state["agent"]["x"], state["agent"]["y"])
+            self.agent.direction = state["agent"]["direction"]
+            self.grid[self.agent.x, self.agent.y] = AGENT
+        self.resources = positions_array(state["resources"])
+        self.resource_grid[self.resources[:, 0], self.resources[:, 1]] = True
+        self.free_cells.load(state["free_cells"])
+        self.np_rng.bit_generator.state = state["rng"]
+        self.build_spatial_index()
+
+    def fork(self):
+        """
+        Независимая копия мира с того же такта. Препятствия (массив и индекс) общие,
+        строки индексов NPC и ресурсов копируются при первом изменении, массивы
+        состояния - сразу (это memcpy). Генератор копируется в том же состоянии:
+        при одинаковых командах копии идут одинаково, различаются только из-за команд.
+        """
+        child = GameWorld.__new__(GameWorld)
+        child.__dict__.update(self.__dict__)
+        child.grid = self.grid.copy()
+        child.resource_grid = self.resource_grid.copy()
+        child.npcs = self.npcs.copy()
+        child.resources = self.resources.copy()
+        child.free_cells = self.free_cells.copy()
+        child.agent = copy.copy(self.agent)
+        child.np_rng = copy.deepcopy(self.np_rng)
+        child.spatial = {
+            "npcs": self.spatial["npcs"].copy(),
+            "resources": self.spatial["resources"].copy(),
+            "obstacles": self.spatial["obstacles"]
+        }
+        child.spatial["npcs"].load_row = child.npc_row
+        return child
+
+    def state_hash(self):
+        """Короткий хэш состояния для проверки воспроизведения (сетка, ресурсы, порядок NPC, счет)"""
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(self.grid.tobytes())
+        digest.update(np.packbits(self.resource_grid).tobytes())
+        digest.update(self.npcs.tobytes())
+        direction = self.agent.direction.encode() if self.agent is not None else b''
+        digest.update(struct.pack('<qq', self.score, self.respawns) + direction)
+        return digest.hexdigest()
+
+    def visible_entities(self, x, y, radius):
+        """Сущности в круге радиуса radius вокруг (x, y) по пространственным индексам"""
+        return {key: index.query_circle(x, y, radius) for key, index in self.spatial.items()}
+
+    def active_npcs(self):
+        """Индексы NPC, которые ходят в этом такте; None - все"""
+        return None
+
+    def dense_layers(self):
+        """Булевы карты field_size × field_size: NPC, ресурсы, препятствия"""
+        return self.grid == NPC, self.resource_grid, self.grid == OBSTACLE
+
+    def is_passable(self, x, y):
+        return self.grid[x, y] == EMPTY
+
+    def move_agent(self, x, y):
+        self.grid[self.agent.x, self.agent.y] = EMPTY
+        self.free_cells.add(self.agent.x, self.agent.y)
+        self.grid[x, y] = AGENT
+        self.free_cells.remove(x, y)
+        self.agent.x, self.agent.y = x, y
+
+    def move_npc(self, index, x, y):
+        old_x, old_y = self.npcs[index].tolist()
+        self.grid[old_x, old_y] = EMPTY
+        self.free_cells.add(old_x, old_y)
+        self.grid[x, y] = NPC
+        self.free_cells.remove(x, y)
+        self.spatial["npcs"].move(old_x, old_y, x, y)
+        self.npcs[index] = (x, y)
+
+    def move_npcs(self, indices, targets):
+        """Перемещает несколько NPC сразу; клетки targets должны быть пустыми"""
+        old = self.npcs[indices]
+        self.grid[old[:, 0], old[:, 1]] = EMPTY
+        self.grid[targets[:, 0], targets[:, 1]] = NPC
+        self.npcs[indices] = targets
+        self.free_cells.replace(targets, old)
+        # Индекс NPC перечитает затронутые строки из сетки, когда они понадобятся
+        self.spatial["npcs"].invalidate(old[:, 0])
+        self.spatial["npcs"].invalidate(targets[:, 0])
+
+    def remove_npc(self, x, y):
+        index = np.flatnonzero((self.npcs[:, 0] == x) & (self.npcs[:, 1] == y))[0]
+        self.npcs = np.delete(self.npcs, index, axis=0)
+        self.grid[x, y] = EMPTY
+        self.free_cells.add(x, y)
+        self.spatial["npcs"].remove(x, y)
+
+    def collect_resource(self, x, y):
+        # Ресурс проходим, поэтому индекс свободных клеток не меняется
+        index = np.flatnonzero((self.resources[:, 0] == x) & (self.resources[:, 1] == y))[0]
+        self.resources = np.delete(self.resources, index, axis=0)
+        self.resource_grid[x, y] = False
+        self.spatial["resources"].remove(x, y)
 
     def get_full_state(self):
         state = {
@@ -158,33 +375,27 @@ class GameWorld:
                 "y": self.agent.y,
                 "direction": self.agent.direction
             },
-            "npcs": [{"x": npc.x, "y": npc.y} for npc in self.npcs],
-            "resources": [{"x": res.x, "y": res.y} for res in self.resources],
-            "obstacles": [{"x": obs.x, "y": obs.y} for obs in self.obstacles]
+            "npcs": [{"x": x, "y": y} for x, y in self.npcs.tolist()],
+            "resources": [{"x": x, "y": y} for x, y in self.resources.tolist()],
+            "obstacles": [{"x": x, "y": y} for x, y in self.obstacles.tolist()]
         }
         return state
 
+    def get_static_map(self):
+        """Неподвижная часть мира: препятствия не меняются до следующего /init"""
+        return {
+            "width": self.field_size,
+            "height": self.field_size,
+            "seed": self.seed,
+            "obstacles": [{"x": x, "y": y} for x, y in self.obstacles.tolist()]
+        }
+
     def handle_collision(self):
         self.score -= 10
         self.respawns += 1
         self.respawn_agent()
 
     def respawn_agent(self):
-        free_cells = []
-        for x in range(self.field_size):
-            for y in range(self.field_size):
-                if self.cells[x][y].is_passable():
-                    free_cells.append((x, y))
-        
-        if free_cells:
-            x, y = random.choice(free_cells)
-            # Удаляем агента со старой позиции
-            old_cell = self.cells[self.agent.x][self.agent.y]
-            old_cell.remove_entity()
-            # Размещаем на новой
-            new_cell = self.cells[x][y]
-            new_cell.add_entity(self.agent)
-            self.agent.x, self.agent.y = x, y
-
-
-
+        if len(self.free_cells):
+            x, y = self.free_cells.choice(self.np_rng)
+            self.move_agent(x, y)
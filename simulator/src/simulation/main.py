@@ -1,103 +1,283 @@
-from flask import Flask, request, jsonify
-from game_objects import GameWorld
-from game_logic import process_game_tick
-from validation import validate_init_params, validate_command
-import threading
+from flask import Flask, request, jsonify, Response, stream_with_context
+from sessions import SessionRegistry
+from stats import TickStats
+from profiler import SamplingProfiler
+import metrics
+from encoding import (JSON_MIMETYPE, MSGPACK_MIMETYPE, GRID_MIMETYPE,
+                      available_mimetypes, encode_msgpack, encode_grid_state, grid_supported)
+import api
+import atexit
+import os
+import time
 
 app = Flask(__name__)
 
-gameworld = None
-lock = threading.Lock()
+MAX_SESSIONS = int(os.environ.get('SIMULATOR_MAX_SESSIONS', 100))
+SESSION_TTL = float(os.environ.get('SIMULATOR_SESSION_TTL', 600))
+LONG_POLL_TIMEOUT = 60
+STREAM_HEARTBEAT = 15
+
+sessions = SessionRegistry(max_sessions=MAX_SESSIONS, idle_ttl=SESSION_TTL)
+# При выходе дописываем записи открытых сессий (иначе файл .gz остается оборванным)
+atexit.register(sessions.close_all)
+tick_stats = TickStats()
+profiler = SamplingProfiler()
+if os.environ.get('SIMULATOR_PROFILER') == '1':
+    profiler.start()
+
+
+def get_session_id(data=None):
+    """session_id из query-параметра, заголовка X-Session-Id или тела запроса"""
+    session_id = request.args.get('session_id') or request.headers.get('X-Session-Id')
+    if session_id is None and isinstance(data, dict):
+        session_id = data.get('session_id')
+    return session_id
+
+
+def session_not_found(session_id):
+    error = api.session_required(sessions, session_id)
+    return None if error is None else reply(error)
+
+
+def reply(result, mimetype=JSON_MIMETYPE, stats=None):
+    """Ответ обработчика api: (payload, status); со stats учитываются время кодирования и размер"""
+    payload, status = result
+    if status != 200:
+        return jsonify(payload), status
+    if stats is None:
+        return encoded_response(payload, mimetype)
+    started = time.perf_counter()
+    response = encoded_response(payload, mimetype)
+    stats.record_payload(time.perf_counter() - started, len(response.get_data()))
+    return response
+
+
+def negotiate_format(grid=False):
+    """Формат ответа по заголовку Accept; None - ни один формат не подходит"""
+    if not request.accept_mimetypes:
+        return JSON_MIMETYPE
+    return request.accept_mimetypes.best_match(available_mimetypes(grid))
+
+
+def not_acceptable(grid=False):
+    return reply(api.not_acceptable(available_mimetypes(grid)))
+
+
+def encoded_response(payload, mimetype):
+    if mimetype == MSGPACK_MIMETYPE:
+        return Response(encode_msgpack(payload), mimetype=MSGPACK_MIMETYPE)
+    return jsonify(payload)
+
+
+def game_not_initialized(session_id):
+    return session_not_found(session_id) or (jsonify(api.GAME_NOT_INITIALIZED), 404)
 
 
 @app.route('/init', methods=['POST'])
 def init_game():
-    global gameworld
-    
-    if gameworld is not None:
-        return jsonify({'error': 'conflict', 'details': 'Game already initialized'}), 409
-    
-    config = request.get_json()
-    if not config:
-        return jsonify({'error': 'invalid_params', 'details': 'No configuration provided'}), 400
-    
-    errors, validated_config = validate_init_params(config)
-    if errors:
-        return jsonify({'error': 'invalid_params', 'details': errors}), 400
-    
-    try:
-        with lock:
-            gameworld = GameWorld(validated_config)
-    except RuntimeError as e:
-        return jsonify({'error': 'initialization_failed', 'details': str(e)}), 500
-    
-    response = {
-        'status': 'game_initialized',
-        'parameters': gameworld.get_init_params()
-    }
-    return jsonify(response), 200
+    return reply(api.init_game(sessions, request.get_json()))
 
 
 @app.route('/status', methods=['GET'])
 def status_check():
-    if gameworld is None:
-        return jsonify({'status': 'not initialized'}), 200
-    
-    try:
-        parameters = gameworld.get_init_params()
-        return jsonify({
-            'status': 'launched',
-            'parameters': parameters
-        }), 200
-    except Exception as e:
-        return jsonify({
-            'status': 'launched',
-            'error': f'Error retrieving parameters: {str(e)}'
-        }), 200
+    return reply(api.status(sessions, get_session_id()))
 
 
 @app.route('/full-state', methods=['GET'])
 def get_full_state():
-    if gameworld is None:
-        return jsonify({
-            'error': 'game_not_found',
-            'message': 'Game state not initialized'
-        }), 404
+    session_id = get_session_id()
+    session = sessions.get(session_id)
+    if session is None:
+        return session_not_found(session_id) or (jsonify(api.GAME_NOT_FOUND), 404)
+    
+    grid = grid_supported(session.engine.gameworld)
+    mimetype = negotiate_format(grid)
+    if mimetype is None:
+        return not_acceptable(grid)
+    
+    # Long-poll: ?wait_version=N - ответить, когда версия состояния станет больше N
+    wait_version = request.args.get('wait_version', type=int)
+    timeout = min(request.args.get('timeout', 30, type=float), LONG_POLL_TIMEOUT)
     
     try:
-        response = gameworld.get_full_state()
-        return jsonify(response), 200
-    except Exception as e:
+        with session.lock:
+            if wait_version is not None:
+                session.wait_for_version(wait_version, timeout)
+            
+            version = session.engine.gameworld.version
+            etag = api.state_etag(session, version, mimetype)
+            if request.if_none_match.contains(etag):
+                body = None
+            elif mimetype == GRID_MIMETYPE:
+                body = session.snapshot(mimetype, lambda: encode_grid_state(session.engine.gameworld))
+            else:
+                body = session.snapshot(mimetype, lambda: encoded_response(
+                    session.engine.full_state(), mimetype).get_data())
+        
+        response = Response(body, status=304 if body is None else 200, mimetype=mimetype)
+        response.set_etag(etag)
+        response.headers['Vary'] = api.ETAG_VARY
+        response.headers['X-State-Version'] = str(version)
+        return response
+    except Exception:
+        app.logger.exception('Full state retrieval failed in session %s', session.id)
         return jsonify({'error': 'state_retrieval_failed'}), 500
     
 
-@app.route('/command', methods=['POST'])
-def handle_command():
-    global gameworld
+@app.route('/static-map', methods=['GET'])
+def get_static_map():
+    """Препятствия мира - для предварительных расчетов на стороне бота"""
+    session_id = get_session_id()
+    session = sessions.get(session_id)
+    if session is None:
+        return session_not_found(session_id) or (jsonify(api.GAME_NOT_FOUND), 404)
+    
+    mimetype = negotiate_format()
+    if mimetype is None:
+        return not_acceptable()
     
-    if gameworld is None:
-        return jsonify({
-            "error": "game_not_initialized",
-            "solution": "Call POST /init first"
-        }), 404
+    etag = api.static_map_etag(session, mimetype)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304, mimetype=mimetype)
+    else:
+        response = reply(api.static_map(session), mimetype)
+    response.set_etag(etag)
+    response.headers['Vary'] = api.ETAG_VARY
+    return response
 
+
+def sse_event(data, event, event_id):
+    lines = [f'id: {event_id}', f'event: {event}']
+    lines += [f'data: {line}' for line in data.splitlines()]
+    return '\n'.join(lines) + '\n\n'
+
+
+@app.route('/stream', methods=['GET'])
+def stream_state():
+    """
+    Server-Sent Events: полное состояние (как /full-state в JSON) после каждого такта.
+    Каждый подписчик получает самую свежую версию, когда готов ее принять:
+    если клиент не успевает, промежуточные такты пропускаются (поле skipped).
+    """
+    session_id = get_session_id()
+    session = sessions.get(session_id)
+    if session is None:
+        return session_not_found(session_id) or (jsonify(api.GAME_NOT_FOUND), 404)
+    
+    def events():
+        sent_version = None
+        while sessions.is_active(session):
+            with session.lock:
+                if sent_version is not None:
+                    session.wait_for_version(sent_version, STREAM_HEARTBEAT)
+                version = session.engine.gameworld.version
+                if version == sent_version:
+                    body = None
+                else:
+                    body = session.snapshot(JSON_MIMETYPE, lambda: encoded_response(
+                        session.engine.full_state(), JSON_MIMETYPE).get_data()).decode()
+                session.touch()
+            
+            if body is None:
+                # Комментарий SSE поддерживает соединение и обнаруживает отключившихся клиентов
+                yield ': heartbeat\n\n'
+                continue
+            skipped = 0 if sent_version is None else version - sent_version - 1
+            if skipped:
+                yield sse_event(str(skipped), 'skipped', version)
+            yield sse_event(body, 'state', version)
+            sent_version = version
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/command', methods=['POST'])
+def handle_command():
     data = request.get_json()
-    errors = validate_command(data)
+    session_id = get_session_id(data)
+    session = sessions.get(session_id)
+    if session is None:
+        return game_not_initialized(session_id)
     
-    if errors:
-        return jsonify({
-            "error": "invalid_command",
-            "details": errors
-        }), 400
+    mimetype = negotiate_format()
+    if mimetype is None:
+        return not_acceptable()
     
-    try:
-        response = process_game_tick(gameworld, data)
-        return jsonify(response)
-    except Exception as e:
-        return jsonify({
-            "error": "processing_failed",
-            "details": str(e)
-        }), 500
+    return reply(api.run_command(session, data, tick_stats), mimetype, tick_stats)
+
+
+@app.route('/command/batch', methods=['POST'])
+def handle_command_batch():
+    """
+    Выполняет несколько тактов за один запрос.
+    Тело: {"commands": [...], "responses": "all" | "last"}.
+    При невалидной команде обработка останавливается, уже выполненные такты остаются.
+    """
+    data = request.get_json()
+    session_id = get_session_id(data)
+    session = sessions.get(session_id)
+    if session is None:
+        return game_not_initialized(session_id)
+
+    commands, mode = api.parse_batch(data)
+    if commands is None:
+        return reply(mode)
+
+    mimetype = negotiate_format()
+    if mimetype is None:
+        return not_acceptable()
+
+    return reply(api.run_batch(session, commands, mode, tick_stats), mimetype, tick_stats)
+
+
+@app.route('/session', methods=['DELETE'])
+def close_session():
+    return reply(api.close_session(sessions, get_session_id()))
+
+
+@app.route('/session/fork', methods=['POST'])
+def fork_session():
+    """Копии мира сессии с текущего такта в новых сессиях"""
+    data = request.get_json(silent=True)
+    session_id = get_session_id(data)
+    session = sessions.get(session_id)
+    if session is None:
+        return game_not_initialized(session_id)
+    return reply(api.fork_session(sessions, session, data))
+
+
+@app.route('/session/checkpoint', methods=['POST'])
+def save_checkpoint():
+    """Сохраняет мир сессии в файл; восстановление - POST /init {"checkpoint": "..."}"""
+    session_id = get_session_id()
+    session = sessions.get(session_id)
+    if session is None:
+        return game_not_initialized(session_id)
+    return reply(api.save_checkpoint(session))
+
+
+@app.route('/stats', methods=['GET'])
+def server_stats():
+    """Пропускная способность и задержки тактов сервера"""
+    return jsonify(dict(tick_stats.summary(), sessions=len(sessions)))
+
+
+@app.route('/metrics', methods=['GET'])
+def server_metrics():
+    """Метрики в формате Prometheus"""
+    return Response(metrics.render(tick_stats, sessions, profiler), content_type=metrics.PROMETHEUS_MIMETYPE)
+
+
+@app.route('/profiler', methods=['GET', 'POST'])
+def sampling_profiler():
+    """
+    GET - накопленные стеки в свернутом формате (?limit=N - только N самых частых).
+    POST {"enabled": true | false, "interval": 0.005, "reset": true} - включение и выключение.
+    """
+    if request.method == 'GET':
+        return Response(profiler.folded(request.args.get('limit', type=int)), mimetype='text/plain')
+    return reply(api.toggle_profiler(profiler, request.get_json()))
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
@@ -0,0 +1,71 @@
+"""
+Метрики сервера в текстовом формате Prometheus (GET /metrics).
+Источники: TickStats (такты и гистограммы фаз), реестр сессий и профилировщик.
+"""
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def sample(name, labels, value):
+    if not labels:
+        return f'{name} {format_value(value)}'
+    label_text = ','.join(f'{key}="{label}"' for key, label in labels.items())
+    return f'{name}{{{label_text}}} {format_value(value)}'
+
+
+def metric(lines, name, kind, help_text, samples):
+    """samples - [(метки, значение), ...]; метки - словарь"""
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    lines.extend(sample(name, labels, value) for labels, value in samples)
+
+
+def histogram(lines, name, help_text, histograms, label=None):
+    """histograms - {значение метки label: Histogram} или {None: Histogram} без метки"""
+    metric(lines, name, 'histogram', help_text, [])
+    for key, hist in sorted(histograms.items(), key=lambda item: str(item[0])):
+        labels = {label: key} if label else {}
+        for bound, count in hist.cumulative():
+            lines.append(sample(f'{name}_bucket', {**labels, 'le': format_value(bound)}, count))
+        lines.append(sample(f'{name}_sum', labels, float(hist.sum)))
+        lines.append(sample(f'{name}_count', labels, hist.count))
+
+
+def render(stats, sessions, profiler=None):
+    """Текст ответа /metrics"""
+    summary = stats.summary()
+    histograms = stats.histograms()
+    lines = []
+
+    metric(lines, 'simulator_ticks_total', 'counter', 'Ticks processed since start',
+           [({}, summary['ticks'])])
+    metric(lines, 'simulator_ticks_per_second', 'gauge', 'Tick throughput over the recent window',
+           [({}, summary['ticks_per_second'])])
+    metric(lines, 'simulator_tick_errors_total', 'counter', 'Ticks failed with an unexpected error',
+           [({}, stats.errors)])
+    metric(lines, 'simulator_uptime_seconds', 'gauge', 'Seconds since server start',
+           [({}, summary['uptime'])])
+    metric(lines, 'simulator_sessions', 'gauge', 'Active game sessions', [({}, len(sessions))])
+    metric(lines, 'simulator_npcs', 'gauge', 'NPCs alive across all sessions',
+           [({}, sessions.npc_count())])
+
+    histogram(lines, 'simulator_tick_phase_seconds',
+              'Tick phase latency: validation, agent, npc, visibility, encode, tick (whole tick under lock)',
+              histograms['phases'], 'phase')
+    histogram(lines, 'simulator_visible_entities', 'Entities visible to the agent per tick',
+              histograms['visible'], 'kind')
+    histogram(lines, 'simulator_payload_bytes', 'Encoded tick response size',
+              {None: histograms['payload']})
+
+    if profiler is not None:
+        status = profiler.status()
+        metric(lines, 'simulator_profiler_enabled', 'gauge', 'Sampling profiler state',
+               [({}, int(status['enabled']))])
+        metric(lines, 'simulator_profiler_samples_total', 'counter', 'Stack samples taken',
+               [({}, status['samples'])])
+    return '\n'.join(lines) + '\n'
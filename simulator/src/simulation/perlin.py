@@ -0,0 +1,104 @@
+import math
+import random
+import numpy as np
+
+
+def fade(values):
+    """
+    Сглаживающая функция Перлина 6t^5 - 15t^4 + 10t^3 для одномерного массива.
+    Считается через math.pow: np.power округляет иначе, а веса по осям разделимы,
+    поэтому вызовов всего O(field_size).
+    """
+    return np.array([
+        6 * math.pow(t, 5) - 15 * math.pow(t, 4) + 10 * math.pow(t, 3)
+        for t in values.tolist()
+    ])
+
+
+def compat_gradients(seed, cx, cy):
+    """
+    Градиенты узлов решетки так же, как их выбирает пакет perlin_noise:
+    random.seed(seed * hash(узла)) и два random.uniform(-1, 1).
+    Для изоляции от глобального random используется собственный экземпляр.
+    """
+    rng = random.Random()
+    gx = np.empty((len(cx), len(cy)))
+    gy = np.empty((len(cx), len(cy)))
+    for i, x in enumerate(cx.tolist()):
+        for j, y in enumerate(cy.tolist()):
+            rng.seed(seed * max(1, abs(x + 10 * y + 1)))
+            gx[i, j] = rng.uniform(-1, 1)
+            gy[i, j] = rng.uniform(-1, 1)
+    return gx, gy
+
+
+def fast_gradients(seed, cx, cy):
+    """Градиенты узлов решетки из генератора NumPy (без посеивания на каждый узел)"""
+    rng = np.random.default_rng(seed)
+    gradients = rng.uniform(-1, 1, size=(2, len(cx), len(cy)))
+    return gradients[0], gradients[1]
+
+
+def hashed_gradients(seed, cx, cy):
+    """
+    Градиенты узлов как хэш (seed, x, y): в отличие от fast_gradients значение узла
+    не зависит от того, какая область решетки строится, поэтому карту можно строить
+    по частям (chunked_world.py), и соседние части стыкуются без швов.
+    """
+    x = cx.astype(np.uint64)[:, None]
+    y = cy.astype(np.uint64)[None, :]
+    key = x * np.uint64(0x9E3779B97F4A7C15) ^ y * np.uint64(0xC2B2AE3D27D4EB4F) ^ np.uint64(seed)
+
+    def mix(h):
+        # Финализатор splitmix64
+        h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return h ^ (h >> np.uint64(31))
+
+    def uniform(h):
+        return (h >> np.uint64(11)).astype(float) * 2.0 ** -52 - 1
+
+    first = mix(key)
+    return uniform(first), uniform(mix(first ^ np.uint64(0xD6E8FEB86659FD93)))
+
+
+def perlin_noise_map(xs, ys, octaves, seed, mode='compat'):
+    """
+    Значения шума Перлина для всех точек сетки xs × ys за один векторный проход.
+
+    В режиме 'compat' результат совпадает с PerlinNoise(octaves, seed)([x, y])
+    поточечно, включая порядок операций с плавающей точкой.
+    Режим 'fast' использует другие градиенты и дает другую карту для того же seed.
+    Режимы 'compat' и 'hashed' поточечны: значение в точке не зависит от xs и ys.
+    """
+    x = np.asarray(xs, dtype=float) * octaves
+    y = np.asarray(ys, dtype=float) * octaves
+    x0 = np.floor(x).astype(np.int64)
+    y0 = np.floor(y).astype(np.int64)
+
+    # Узлы решетки, покрывающие область, и индексы левого/верхнего узла точки
+    cx = np.arange(x0.min(), x0.max() + 2)
+    cy = np.arange(y0.min(), y0.max() + 2)
+    if mode == 'compat':
+        gx, gy = compat_gradients(seed, cx, cy)
+    elif mode == 'fast':
+        gx, gy = fast_gradients(seed, cx, cy)
+    elif mode == 'hashed':
+        gx, gy = hashed_gradients(seed, cx, cy)
+    else:
+        raise ValueError(f'Unknown noise mode: {mode}')
+    ix = (x0 - cx[0])[:, None]
+    iy = (y0 - cy[0])[None, :]
+
+    # Порядок обхода углов как в itertools.product: (x0,y0), (x0,y1), (x1,y0), (x1,y1)
+    result = np.zeros((len(x), len(y)))
+    for dx in (0, 1):
+        for dy in (0, 1):
+            dist_x = x - (x0 + dx)
+            dist_y = y - (y0 + dy)
+            weight = fade(1 - np.abs(dist_x))[:, None] * fade(1 - np.abs(dist_y))[None, :]
+            dist_x = dist_x[:, None]
+            dist_y = dist_y[None, :]
+            dot = 0 + gx[ix + dx, iy + dy] * dist_x + gy[ix + dx, iy + dy] * dist_y
+            result = result + weight * dot
+    return result
@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+from collections import Counter
+
+# Верхние кадры потоков, которые ничего не делают (ждут запросов или задач):
+# такие стеки не учитываются, иначе они заслоняют работу
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('selectors.py', 'select'),
+    ('socketserver.py', 'serve_forever'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+}
+
+
+class SamplingProfiler:
+    """
+    Выборочный профилировщик без внешних инструментов: фоновый поток раз в interval
+    секунд снимает стеки всех остальных потоков сервера (sys._current_frames)
+    и считает одинаковые стеки. Накладные расходы есть только пока он включен.
+
+    folded() возвращает стеки в свернутом формате flamegraph.pl / speedscope:
+        main.py:handle_command;api.py:run_command;game_logic.py:process_game_tick 42
+    """
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopping = threading.Event()
+
+    @property
+    def enabled(self):
+        return self.thread is not None
+
+    def start(self, interval=None):
+        with self.lock:
+            if interval is not None:
+                self.interval = interval
+            if self.thread is not None:
+                return
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.stopping.set()
+            thread.join()
+
+    def reset(self):
+        with self.lock:
+            self.stacks.clear()
+            self.samples = 0
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self.stopping.wait(self.interval):
+            stacks = [self._stack(frame) for ident, frame in sys._current_frames().items() if ident != own]
+            with self.lock:
+                self.samples += 1
+                self.stacks.update(stack for stack in stacks if stack)
+
+    def _stack(self, frame):
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            return None
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def folded(self, limit=None):
+        """Самые частые стеки в свернутом формате, по одному на строку"""
+        with self.lock:
+            stacks = self.stacks.most_common(limit)
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+    def status(self):
+        with self.lock:
+            return {
+                'enabled': self.thread is not None,
+                'interval': self.interval,
+                'samples': self.samples,
+                'stacks': len(self.stacks),
+            }
@@ -0,0 +1,129 @@
+"""
+Запись игровой сессии для воспроизведения (replay.py).
+
+Формат - JSON Lines, только дозапись; файл с суффиксом .gz сжимается gzip:
+    {"type": "header", "format": "reco-trace", "version": 1, "config": {...}, "snapshot_interval": 1000}
+    {"t": 1, "c": {"command": "move", "direction": "left"}, "h": "5f0c2a9e1b7d3c44"}
+    ...
+    {"type": "snapshot", "t": 1000, "state": {...}}
+Строка такта: номер такта с начала игры, команда и хэш состояния мира после такта
+(GameWorld.state_hash). Снимок (GameWorld.get_state) пишется каждые snapshot_interval
+тактов после строки такта - с него можно начать воспроизведение с середины игры.
+Если мир не создан по config, а восстановлен (сохранение, снимок), сразу за заголовком
+идет снимок такта 0 - воспроизведение начинается с него.
+config - проверенные параметры /init, включая seed.
+"""
+import gzip
+import json
+
+TRACE_FORMAT = 'reco-trace'
+TRACE_VERSION = 1
+# Поля команды, влияющие на такт (observation, resync, session_id - только на ответ)
+COMMAND_FIELDS = ('command', 'direction')
+
+
+class TraceError(Exception):
+    """Файл не является записью поддерживаемой версии"""
+
+
+def open_trace(path, mode):
+    """Текстовый файл записи; .gz - со сжатием"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def encode_line(record):
+    return json.dumps(record, separators=(',', ':')) + '\n'
+
+
+class TraceWriter:
+    """
+    Пишет запись одного мира. Строки буферизуются и попадают на диск
+    при заполнении буфера, на каждом снимке и при close().
+    """
+    def __init__(self, path, config, snapshot_interval=1000, state=None):
+        """state - get_state() мира на начало записи, если мир восстановлен, а не создан по config"""
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.tick = 0
+        self.file = open_trace(path, 'w')
+        self.file.write(encode_line({
+            'type': 'header',
+            'format': TRACE_FORMAT,
+            'version': TRACE_VERSION,
+            'config': config,
+            'snapshot_interval': snapshot_interval
+        }))
+        if state is not None:
+            self.file.write(encode_line({'type': 'snapshot', 't': 0, 'state': state}))
+
+    def record(self, gameworld, command_data):
+        """Вызывается после каждого выполненного такта"""
+        self.tick += 1
+        command = {key: command_data[key] for key in COMMAND_FIELDS if key in command_data}
+        self.file.write(encode_line({'t': self.tick, 'c': command, 'h': gameworld.state_hash()}))
+        if self.snapshot_interval and self.tick % self.snapshot_interval == 0:
+            self.file.write(encode_line({'type': 'snapshot', 't': self.tick, 'state': gameworld.get_state()}))
+            self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class Trace:
+    """
+    Прочитанная запись: config, commands[i] и hashes[i] - команда и хэш такта i + 1.
+    Снимки хранятся строками и разбираются только при обращении (snapshot).
+    Обрыв записи (процесс завершился, не закрыв файл) не считается ошибкой:
+    читаются все полные строки до обрыва, в том числе из оборванного потока gzip.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.commands = []
+        self.hashes = []
+        self.snapshots = {}
+        with open_trace(path, 'r') as f:
+            header = self._parse(f.readline())
+            if header is None or header.get('format') != TRACE_FORMAT:
+                raise TraceError(f'{path} is not a {TRACE_FORMAT} file')
+            if header.get('version') != TRACE_VERSION:
+                raise TraceError(f'Unsupported trace version {header.get("version")}')
+            self.config = header['config']
+            self.snapshot_interval = header.get('snapshot_interval')
+
+            try:
+                self._read_records(f)
+            except (EOFError, gzip.BadGzipFile):
+                pass  # поток gzip оборван: остаются записи, прочитанные до обрыва
+
+    def _read_records(self, f):
+        for line in f:
+            if line.startswith('{"type":"snapshot"') and line.endswith('\n'):
+                # Номер такта идет сразу после типа - без разбора всего снимка
+                tick = int(line[len('{"type":"snapshot","t":'):line.index(',"state"')])
+                self.snapshots[tick] = line
+                continue
+            record = self._parse(line)
+            if record is None:
+                break
+            self.commands.append(record['c'])
+            self.hashes.append(record['h'])
+
+    @staticmethod
+    def _parse(line):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def __len__(self):
+        return len(self.commands)
+
+    def nearest_snapshot(self, tick):
+        """Номер последнего такта со снимком не позже tick (0 - начало игры)"""
+        return max((t for t in self.snapshots if t <= tick), default=0)
+
+    def snapshot(self, tick):
+        return json.loads(self.snapshots[tick])['state']
@@ -0,0 +1,95 @@
+"""
+Воспроизведение записи игры (recording.py) во встроенном движке без сервера.
+
+    python replay.py game.jsonl                 # все такты с проверкой хэшей
+    python replay.py game.jsonl --to 50000      # перейти к такту через ближайший снимок
+    python replay.py game.jsonl --from 40000 --to 41000
+
+    replayer = Replayer(Trace("game.jsonl"))
+    replayer.seek(50000)
+    state = replayer.engine.full_state()
+"""
+import argparse
+import time
+from engine import SimulationEngine
+from recording import Trace
+
+
+class ReplayMismatch(Exception):
+    """Состояние после такта не совпало с записанным"""
+    def __init__(self, tick, expected, actual):
+        super().__init__(f'State hash mismatch at tick {tick}: expected {expected}, got {actual}')
+        self.tick = tick
+        self.expected = expected
+        self.actual = actual
+
+
+class Replayer:
+    """Движок, который проходит такты записи; tick - сколько тактов выполнено"""
+    def __init__(self, trace):
+        self.trace = trace
+        self.engine = SimulationEngine()
+        self.tick = None
+
+    def seek(self, tick):
+        """
+        Переходит к состоянию после такта tick: с текущего места, если оно не дальше tick
+        и не дальше ближайшего снимка, иначе со снимка (или с начала игры).
+        """
+        tick = min(tick, len(self.trace))
+        start = self.trace.nearest_snapshot(tick)
+        if self.tick is None or self.tick > tick or self.tick < start:
+            self._start(start)
+        self.run(tick, verify=False)
+
+    def _start(self, tick):
+        """Состояние после такта tick со снимка; без снимка (tick 0) - новый мир по config"""
+        if tick in self.trace.snapshots:
+            self.engine.restore(self.trace.config, self.trace.snapshot(tick))
+        else:
+            self.engine.reset(self.trace.config)
+        self.tick = tick
+
+    def run(self, tick=None, verify=True):
+        """Выполняет такты до tick (по умолчанию до конца), сверяя хэши состояния"""
+        if self.tick is None:
+            self._start(0)
+        end = len(self.trace) if tick is None else min(tick, len(self.trace))
+        commands, hashes = self.trace.commands, self.trace.hashes
+        engine = self.engine
+        while self.tick < end:
+            engine.step(commands[self.tick])
+            self.tick += 1
+            if verify:
+                actual = engine.gameworld.state_hash()
+                if actual != hashes[self.tick - 1]:
+                    raise ReplayMismatch(self.tick, hashes[self.tick - 1], actual)
+        return self.tick
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay a recorded game')
+    parser.add_argument('trace', help='trace file written by the simulator (.jsonl or .jsonl.gz)')
+    parser.add_argument('--from', dest='start', type=int, default=0,
+                        help='start from this tick (jumps to the nearest snapshot first)')
+    parser.add_argument('--to', dest='end', type=int, default=None, help='stop after this tick')
+    parser.add_argument('--no-verify', action='store_true', help='do not check state hashes')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    trace = Trace(args.trace)
+    replayer = Replayer(trace)
+    replayer.seek(args.start)
+    first = replayer.tick
+    try:
+        replayer.run(args.end, verify=not args.no_verify)
+    except ReplayMismatch as e:
+        print(e)
+        raise SystemExit(1)
+    elapsed = time.perf_counter() - started
+
+    state = replayer.engine.full_state()
+    ticks = replayer.tick - first
+    print(f'Ticks: {first}..{replayer.tick} of {len(trace)} | Score: {state["score"]} | '
+          f'Respawns: {state["respawns"]} | {ticks / elapsed:.0f} ticks/s'
+          + ('' if args.no_verify else ' | hashes verified'))
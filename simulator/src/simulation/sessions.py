@@ -0,0 +1,139 @@
+import threading
+import time
+import uuid
+from delta import DeltaTracker
+
+
+class SessionLimitError(Exception):
+    pass
+
+
+class Session:
+    def __init__(self, session_id, engine):
+        self.id = session_id
+        self.engine = engine
+        # Все обращения к движку сессии выполняются под этой блокировкой
+        self.lock = threading.Lock()
+        # Оповещение ожидающих (long-poll) о новом такте
+        self.changed = threading.Condition(self.lock)
+        # Сериализованные снимки полного состояния для текущей версии мира
+        self.snapshot_version = None
+        self.snapshots = {}
+        # Что клиент уже видел - для разностных наблюдений
+        self.delta = DeltaTracker()
+        self.last_access = time.monotonic()
+
+    def touch(self):
+        self.last_access = time.monotonic()
+
+    def close(self):
+        """Сессия удалена из реестра: дописывает запись тактов, если она велась"""
+        with self.lock:
+            self.engine.stop_trace()
+
+    def snapshot(self, key, build):
+        """
+        Сериализованный снимок состояния в формате key, кэшированный до следующего
+        изменения версии мира. Вызывается под self.lock.
+        """
+        version = self.engine.gameworld.version
+        if version != self.snapshot_version:
+            self.snapshot_version = version
+            self.snapshots = {}
+        if key not in self.snapshots:
+            self.snapshots[key] = build()
+        return self.snapshots[key]
+
+    def wait_for_version(self, version, timeout):
+        """Ждет, пока версия мира станет больше version. Вызывается под self.lock."""
+        return self.changed.wait_for(lambda: self.engine.gameworld.version > version, timeout)
+
+    def encode_observation(self, observation, command_data):
+        """Полное или разностное наблюдение в зависимости от поля observation команды"""
+        if command_data.get('observation', 'full') == 'delta':
+            return self.delta.encode(observation, resync=command_data.get('resync', False))
+        self.delta.forget()
+        return observation
+
+
+class SessionRegistry:
+    """
+    Реестр игровых сессий: session_id -> Session.
+    Сессии, к которым не обращались дольше idle_ttl секунд, удаляются
+    при следующем обращении к реестру.
+    """
+    def __init__(self, max_sessions=100, idle_ttl=600):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def _evict_expired(self):
+        """Удаляет просроченные сессии и возвращает их; закрывать - после освобождения self.lock"""
+        deadline = time.monotonic() - self.idle_ttl
+        expired = [sid for sid, s in self.sessions.items() if s.last_access < deadline]
+        return [self.sessions.pop(sid) for sid in expired]
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def create(self, engine, session_id=None):
+        with self.lock:
+            expired = self._evict_expired()
+            if len(self.sessions) < self.max_sessions:
+                session = Session(session_id or self.new_id(), engine)
+                self.sessions[session.id] = session
+            else:
+                session = None
+        for s in expired:
+            s.close()
+        if session is None:
+            raise SessionLimitError(f'Session limit reached ({self.max_sessions})')
+        return session
+
+    def get(self, session_id):
+        """
+        Возвращает сессию по id. Если id не указан и сессия ровно одна,
+        возвращается она (совместимость с клиентами без session_id).
+        """
+        with self.lock:
+            expired = self._evict_expired()
+            if session_id is None:
+                session = next(iter(self.sessions.values())) if len(self.sessions) == 1 else None
+            else:
+                session = self.sessions.get(session_id)
+            if session is not None:
+                session.touch()
+        for s in expired:
+            s.close()
+        return session
+
+    def is_active(self, session):
+        with self.lock:
+            return self.sessions.get(session.id) is session
+
+    def remove(self, session_id):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.close()
+        return True
+
+    def close_all(self):
+        """Удаляет все сессии и дописывает их записи (остановка сервера)"""
+        with self.lock:
+            closed = list(self.sessions.values())
+            self.sessions.clear()
+        for session in closed:
+            session.close()
+
+    def npc_count(self):
+        """Живые NPC во всех мирах (без блокировок миров - значение для метрик)"""
+        with self.lock:
+            worlds = [s.engine.gameworld for s in self.sessions.values()]
+        return sum(len(world.npcs) for world in worlds if world is not None)
@@ -0,0 +1,114 @@
+import bisect
+import math
+import numpy as np
+
+
+class RowIndex:
+    """
+    Пространственный индекс сущностей одного типа: для каждой строки x
+    отсортированный список координат y (rows) и параллельный список готовых
+    словарей {"x": x, "y": y} (items). Запрос круга обходит только строки
+    в пределах радиуса, бинарным поиском находит отрезок y и копирует срез items.
+    Одиночные перемещения и удаления обновляют индекс точечно,
+    массовые (фаза NPC) - пересборкой по массиву позиций.
+    copy() не копирует строки: копия и оригинал делят их, пока одна из сторон
+    не изменит строку (копирование при записи, owned - строки, принадлежащие индексу).
+    С load_row (x -> отсортированный список y строки по сетке мира) массовые перемещения
+    только помечают строки устаревшими (invalidate), и строка перечитывается при первом
+    обращении: запрос видимости касается лишь строк в пределах радиуса.
+    """
+    def __init__(self, field_size, positions, load_row=None):
+        self.field_size = field_size
+        self.load_row = load_row
+        self.rebuild(positions)
+
+    def __len__(self):
+        return self.count
+
+    def rebuild(self, positions):
+        """Пересобирает индекс по массиву позиций (n, 2)"""
+        ordered = positions[np.lexsort((positions[:, 1], positions[:, 0]))]
+        bounds = np.searchsorted(ordered[:, 0], np.arange(self.field_size + 1)).tolist()
+        ys = ordered[:, 1].tolist()
+        self.rows = [ys[start:end] for start, end in zip(bounds, bounds[1:])]
+        self.items = [[{"x": x, "y": y} for y in row] for x, row in enumerate(self.rows)]
+        self.count = len(positions)
+        self.owned = bytearray(b'\x01') * self.field_size
+        self.stale = bytearray(self.field_size)
+
+    def copy(self):
+        clone = RowIndex.__new__(RowIndex)
+        clone.field_size = self.field_size
+        clone.rows = list(self.rows)
+        clone.items = list(self.items)
+        clone.count = self.count
+        clone.load_row = self.load_row
+        clone.stale = bytearray(self.stale)
+        # Строки теперь общие: перед изменением их копирует каждая сторона
+        clone.owned = bytearray(self.field_size)
+        self.owned = bytearray(self.field_size)
+        return clone
+
+    def invalidate(self, xs):
+        """
+        Строки xs (массив номеров, повторы допустимы) изменились в сетке - только
+        перемещения, число сущностей то же: они перечитываются через load_row
+        при следующем обращении
+        """
+        np.frombuffer(self.stale, dtype=bool)[xs] = True
+
+    def _refresh(self, x):
+        ys = self.load_row(x)
+        self.count += len(ys) - len(self.rows[x])
+        self.rows[x] = ys
+        self.items[x] = [{"x": x, "y": y} for y in ys]
+        self.owned[x] = 1
+        self.stale[x] = 0
+
+    def _own(self, x):
+        if self.stale[x]:
+            self._refresh(x)
+        elif not self.owned[x]:
+            self.rows[x] = list(self.rows[x])
+            self.items[x] = list(self.items[x])
+            self.owned[x] = 1
+
+    def add(self, x, y):
+        self._own(x)
+        row = self.rows[x]
+        position = bisect.bisect_left(row, y)
+        row.insert(position, y)
+        self.items[x].insert(position, {"x": x, "y": y})
+        self.count += 1
+
+    def remove(self, x, y):
+        self._own(x)
+        position = bisect.bisect_left(self.rows[x], y)
+        del self.rows[x][position]
+        del self.items[x][position]
+        self.count -= 1
+
+    def move(self, old_x, old_y, x, y):
+        self.remove(old_x, old_y)
+        self.add(x, y)
+
+    def query_circle(self, cx, cy, radius):
+        """
+        Позиции в круге (x - cx)^2 + (y - cy)^2 <= radius^2 в формате {"x": .., "y": ..},
+        упорядоченные по x, затем по y. Словари принадлежат индексу - не изменяйте их.
+        """
+        result = []
+        if not self.count:
+            return result
+        rows, stale = self.rows, self.stale
+        for x in range(max(0, cx - radius), min(self.field_size - 1, cx + radius) + 1):
+            if stale[x]:
+                self._refresh(x)
+            row = rows[x]
+            if not row:
+                continue
+            half = math.isqrt(radius * radius - (x - cx) * (x - cx))
+            lo = bisect.bisect_left(row, cy - half)
+            hi = bisect.bisect_right(row, cy + half)
+            result += self.items[x][lo:hi]
+        return result
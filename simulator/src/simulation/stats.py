@@ -0,0 +1,125 @@
+import bisect
+import threading
+import time
+from collections import deque
+
+# Границы корзин гистограмм (верхние, включительно)
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                   0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (как histogram в Prometheus); не потокобезопасна"""
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # Последняя корзина - значения больше всех границ (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value, times=1):
+        self.counts[bisect.bisect_left(self.buckets, value)] += times
+        self.sum += value * times
+        self.count += times
+
+    def cumulative(self):
+        """[(граница, число значений <= границы), ...], последняя граница - inf"""
+        result, total = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class TickStats:
+    """
+    Статистика тактов сервера: пропускная способность и задержки.
+    Хранит длительности последних window тактов (кольцевой буфер),
+    процентили считаются по ним при запросе.
+    Кроме того накапливает гистограммы для /metrics: длительность фаз такта
+    (SimulationEngine.timings), число видимых сущностей, размер и время
+    кодирования ответов.
+    """
+    def __init__(self, window=10000):
+        self.samples = deque(maxlen=window)
+        self.total = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.phases = {'tick': Histogram(LATENCY_BUCKETS)}
+        self.visible = {}
+        self.payload = Histogram(SIZE_BUCKETS)
+
+    def record(self, duration, ticks=1):
+        """Длительность обработки запроса с ticks тактами (для пакета - на такт)"""
+        now = time.monotonic()
+        with self.lock:
+            self.total += ticks
+            per_tick = duration / ticks
+            self.phases['tick'].observe(per_tick, ticks)
+            for _ in range(min(ticks, self.samples.maxlen)):
+                self.samples.append((now, per_tick))
+
+    def record_phases(self, timings, observation):
+        """Фазы одного такта и число видимых агенту сущностей каждого вида"""
+        with self.lock:
+            for phase, duration in timings.items():
+                if phase not in self.phases:
+                    self.phases[phase] = Histogram(LATENCY_BUCKETS)
+                self.phases[phase].observe(duration)
+            for kind, entities in observation['visible_entities'].items():
+                if kind not in self.visible:
+                    self.visible[kind] = Histogram(COUNT_BUCKETS)
+                self.visible[kind].observe(len(entities))
+
+    def record_payload(self, duration, size):
+        """Кодирование ответа: время и размер в байтах"""
+        with self.lock:
+            if 'encode' not in self.phases:
+                self.phases['encode'] = Histogram(LATENCY_BUCKETS)
+            self.phases['encode'].observe(duration)
+            self.payload.observe(size)
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def histograms(self):
+        """Копии гистограмм: {'phases': {...}, 'visible': {...}, 'payload': Histogram}"""
+        def copy(histogram):
+            result = Histogram(histogram.buckets)
+            result.counts, result.sum, result.count = list(histogram.counts), histogram.sum, histogram.count
+            return result
+
+        with self.lock:
+            return {
+                'phases': {name: copy(h) for name, h in self.phases.items()},
+                'visible': {name: copy(h) for name, h in self.visible.items()},
+                'payload': copy(self.payload),
+            }
+
+    def summary(self):
+        with self.lock:
+            samples = list(self.samples)
+            total = self.total
+        now = time.monotonic()
+
+        result = {'ticks': total, 'uptime': round(now - self.started, 3)}
+        if not samples:
+            result.update(ticks_per_second=0.0, latency_ms=None)
+            return result
+
+        # Пропускная способность - по интервалу, который покрывает буфер (не меньше секунды)
+        span = max(now - samples[0][0], 1.0)
+        durations = sorted(duration for _, duration in samples)
+
+        def percentile(p):
+            return round(durations[min(len(durations) - 1, int(p * len(durations)))] * 1000, 3)
+
+        result.update(
+            ticks_per_second=round(len(samples) / span, 1),
+            latency_ms={'p50': percentile(0.5), 'p99': percentile(0.99), 'max': percentile(1.0)}
+        )
+        return result
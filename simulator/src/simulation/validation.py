@@ -1,4 +1,8 @@
-import random
+import secrets
+
+# Плотная сетка (GameWorld) - до DENSE_MAX_FIELD_SIZE, больше - только чанки (ChunkedWorld)
+DENSE_MAX_FIELD_SIZE = 100
+MAX_FIELD_SIZE = 10000
 
 def validate_init_params(config):
     errors = []
@@ -23,20 +27,42 @@ def validate_init_params(config):
     if not isinstance(npc_movement, bool):
         errors.append('npc_movement must be boolean')
     
-    if not 10 <= field_size <= 100:
-        errors.append('field_size must be between 10 and 100')
+    if not 10 <= field_size <= MAX_FIELD_SIZE:
+        errors.append(f'field_size must be between 10 and {MAX_FIELD_SIZE}')
+    
+    world_mode = config.get('world_mode', 'dense' if field_size <= DENSE_MAX_FIELD_SIZE else 'chunked')
+    if world_mode not in ('dense', 'chunked'):
+        errors.append('world_mode must be "dense" or "chunked"')
+    elif world_mode == 'dense' and field_size > DENSE_MAX_FIELD_SIZE:
+        errors.append(f'field_size above {DENSE_MAX_FIELD_SIZE} requires world_mode "chunked"')
     
-    if not 0 <= npc_count <= 1000:
+    # В чанковом мире сущности создаются по мере исследования: ограничение - только доля поля
+    if world_mode == 'dense' and not 0 <= npc_count <= 1000:
         errors.append('npc_count must be between 0 and 1000')
+    elif npc_count < 0:
+        errors.append('npc_count must be non-negative')
     
-    if not 0 <= resource_count <= 1000:
+    if world_mode == 'dense' and not 0 <= resource_count <= 1000:
         errors.append('resource_count must be between 0 and 1000')
+    elif resource_count < 0:
+        errors.append('resource_count must be non-negative')
     
     if not 0 <= obstacle_percent <= 30:
         errors.append('obstacle_percent must be between 0 and 30')
 
     if not 5 <= vision_radius <= 100:
         errors.append('agent_vision_radius must be between 5 and 100')
+
+    if config.get('noise_mode', 'compat') not in ('compat', 'fast'):
+        errors.append('noise_mode must be "compat" or "fast"')
+
+    if config.get('npc_update_mode', 'vectorized') not in ('vectorized', 'sequential'):
+        errors.append('npc_update_mode must be "vectorized" or "sequential"')
+
+    # seed 0 недопустим: в шуме compat (rng.seed(seed * ...)) все узлы получают один поток
+    seed = config.get('seed', 1)
+    if not isinstance(seed, int) or isinstance(seed, bool) or seed < 1:
+        errors.append('seed must be a positive integer')
     
 
     total_cells = field_size ** 2
@@ -54,7 +80,10 @@ def validate_init_params(config):
     if required_cells > total_cells:
         errors.append(f'Not enough space: requires {required_cells} cells but only {total_cells} available')
 
-    config['seed'] = config.get('seed', random.randint(1, 1000000))
+    # Seed по умолчанию не зависит от глобального random и возвращается клиенту в /init,
+    # так что любой запуск можно повторить
+    config['seed'] = config.get('seed', secrets.randbelow(1000000) + 1)
+    config['world_mode'] = world_mode
     
     return (errors, config) if not errors else (errors, None)
 
@@ -86,4 +115,10 @@ def validate_command(data):
             if direction not in valid_directions:
                 errors.append(f'Invalid direction: {direction}. Valid directions: {", ".join(valid_directions)}')
     
+    if data.get('observation', 'full') not in ('full', 'delta'):
+        errors.append('observation must be "full" or "delta"')
+    
+    if not isinstance(data.get('resync', False), bool):
+        errors.append('resync must be boolean')
+    
     return errors
\ No newline at end of file
@@ -1,20 +1,99 @@
 import requests
+import numpy as np
+import json
 import os
+import struct
+import sys
 import time
 
 SERVER_URL = "http://0.0.0.0:5000"  # Адрес сервера
+LONG_POLL_TIMEOUT = 30  # Сколько сервер держит запрос в ожидании нового такта
+RETRY_DELAY = 0.2  # Пауза перед повтором, если игра недоступна
 
-def get_full_state():
-    """Получение полного состояния игры"""
+# Бинарный формат полного состояния (см. simulation/encoding.py)
+GRID_MIMETYPE = "application/x-reco-grid"
+GRID_HEADER = struct.Struct('<4sBHHqqhhB')
+GRID_LAYERS = ('npcs', 'resources', 'obstacles')
+DIRECTIONS = ('up', 'down', 'left', 'right')
+
+def decode_grid_state(data):
+    """Разбор application/x-reco-grid в словарь формата JSON-ответа /full-state"""
+    magic, version, width, height, score, respawns, agent_x, agent_y, direction = \
+        GRID_HEADER.unpack_from(data)
+    if magic != b'RECO' or version != 1:
+        raise ValueError("Unsupported grid state format")
+    
+    state = {
+        "width": width,
+        "height": height,
+        "score": score,
+        "respawns": respawns,
+        "agent": {"x": agent_x, "y": agent_y, "direction": DIRECTIONS[direction]}
+    }
+    cells = width * height
+    layer_size = (cells + 7) // 8
+    offset = GRID_HEADER.size
+    for name in GRID_LAYERS:
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8, count=layer_size, offset=offset))
+        xs, ys = np.divmod(np.flatnonzero(bits[:cells]), height)
+        state[name] = [{"x": x, "y": y} for x, y in zip(xs.tolist(), ys.tolist())]
+        offset += layer_size
+    return state
+
+def get_full_state(version=None, etag=None):
+    """
+    Получение полного состояния игры.
+    С version сервер держит запрос (long-poll), пока состояние не станет новее.
+    Возвращает (состояние или None, версия, ETag); состояние None и прежняя версия -
+    изменений нет.
+    """
+    headers = {"Accept": f"{GRID_MIMETYPE}, application/json;q=0.5"}
+    params = {}
+    if version is not None:
+        params = {"wait_version": version, "timeout": LONG_POLL_TIMEOUT}
+    if etag:
+        headers["If-None-Match"] = etag
+    
     try:
-        response = requests.get(f"{SERVER_URL}/full-state", timeout=5)
+        response = requests.get(
+            f"{SERVER_URL}/full-state",
+            headers=headers,
+            params=params,
+            timeout=LONG_POLL_TIMEOUT + 5
+        )
+        if response.status_code == 304:
+            return None, version, etag
         if response.status_code == 200:
-            return response.json()
+            new_version = int(response.headers.get("X-State-Version", 0))
+            new_etag = response.headers.get("ETag")
+            if response.headers.get("Content-Type", "").startswith(GRID_MIMETYPE):
+                return decode_grid_state(response.content), new_version, new_etag
+            return response.json(), new_version, new_etag
         print(f"Ошибка сервера: {response.status_code}")
-        return None
     except requests.exceptions.RequestException as e:
         print(f"Ошибка соединения: {str(e)}")
-        return None
+    return None, None, None
+
+def stream_states():
+    """
+    Подписка на /stream (Server-Sent Events): выдает полное состояние после каждого такта.
+    Медленный клиент получает только свежие такты - сервер пропускает устаревшие.
+    """
+    with requests.get(f"{SERVER_URL}/stream", stream=True, timeout=(5, LONG_POLL_TIMEOUT)) as response:
+        if response.status_code != 200:
+            print(f"Ошибка сервера: {response.status_code}")
+            return
+        event, data = None, []
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:"):].strip())
+            elif not line:
+                # Пустая строка завершает событие
+                if event == "state" and data:
+                    yield json.loads("\n".join(data))
+                event, data = None, []
 
 def display_game(state):
     """Визуализация игрового поля с помощью emoji"""
@@ -63,20 +142,39 @@ def display_game(state):
           f"| Ресурсы: {len(state['resources'])} "
           f"| Препятствия: {len(state['obstacles'])}")
 
-def main():
-    """Основной цикл визуализатора"""
-    print("Запуск визуализатора игры...")
-    print("Ожидание инициализации игры на сервере")
-    
+def poll_loop():
+    """Long-poll /full-state: запрос ждет на сервере следующего такта"""
+    version = etag = None
     while True:
-        state = get_full_state()
+        state, new_version, etag = get_full_state(version, etag)
         
         if state:
             display_game(state)
-        else:
+        elif new_version is None:
             print("Игра не инициализирована или сервер недоступен...")
-        
-        time.sleep(0.2)
+            time.sleep(RETRY_DELAY)
+        version = new_version
+
+def stream_loop():
+    """Подписка на поток тактов с переподключением"""
+    while True:
+        try:
+            for state in stream_states():
+                display_game(state)
+        except requests.exceptions.RequestException as e:
+            print(f"Ошибка соединения: {str(e)}")
+        print("Игра не инициализирована или сервер недоступен...")
+        time.sleep(RETRY_DELAY)
+
+def main():
+    """Основной цикл визуализатора (--poll - long-poll вместо потока)"""
+    print("Запуск визуализатора игры...")
+    print("Ожидание инициализации игры на сервере")
+    
+    if "--poll" in sys.argv:
+        poll_loop()
+    else:
+        stream_loop()
 
 if __name__ == "__main__":
     try:
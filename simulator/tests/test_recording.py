@@ -0,0 +1,79 @@
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "simulation"))
+
+from engine import SimulationEngine
+from recording import Trace
+from sessions import SessionRegistry
+
+CONFIG = {
+    "field_size": 30,
+    "npc_count": 20,
+    "resource_count": 20,
+    "obstacle_percent": 10,
+    "npc_movement": True,
+    "agent_vision_radius": 5,
+    "seed": 7,
+}
+COMMANDS = [{"command": "move", "direction": d} for d in ("up", "right", "down", "left")]
+
+
+def play(engine, ticks):
+    commands = [COMMANDS[(tick // 3) % 4] for tick in range(ticks)]
+    for command in commands:
+        engine.step(command)
+    return commands
+
+
+def test_truncated_gzip_trace_keeps_complete_records(tmp_path):
+    path = str(tmp_path / "game.jsonl.gz")
+    engine = SimulationEngine()
+    engine.reset(CONFIG)
+    engine.start_trace(path, snapshot_interval=1000)
+    commands = play(engine, 1050)
+
+    # Копия файла до close(): как после аварийного завершения процесса
+    cut = str(tmp_path / "cut.jsonl.gz")
+    shutil.copyfile(path, cut)
+    trace = Trace(cut)
+
+    assert 1000 <= len(trace) <= 1050
+    assert 1000 in trace.snapshots
+    assert trace.commands == commands[:len(trace)]
+    engine.stop_trace()
+
+
+def test_gzip_trace_cut_mid_stream(tmp_path):
+    path = str(tmp_path / "game.jsonl.gz")
+    engine = SimulationEngine()
+    engine.reset(CONFIG)
+    engine.start_trace(path, snapshot_interval=100)
+    commands = play(engine, 300)
+    engine.stop_trace()
+
+    with open(path, "rb") as f:
+        data = f.read()
+    cut = str(tmp_path / "cut.jsonl.gz")
+    with open(cut, "wb") as f:
+        f.write(data[:len(data) // 2])
+    trace = Trace(cut)
+
+    assert 0 < len(trace) < 300
+    assert trace.commands == commands[:len(trace)]
+
+
+def test_close_all_finishes_traces(tmp_path):
+    path = str(tmp_path / "game.jsonl.gz")
+    engine = SimulationEngine()
+    engine.reset(CONFIG)
+    engine.start_trace(path)
+    registry = SessionRegistry()
+    registry.create(engine)
+    commands = play(engine, 50)
+
+    registry.close_all()
+
+    assert len(registry) == 0
+    assert Trace(path).commands == commands